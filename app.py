@@ -1,9 +1,15 @@
-import streamlit as st
+import hashlib
+import io
+import os
+import time
 import pandas as pd
+import streamlit as st
+from job_service import JobClient
 from sales_agent import SalesAgent
 from technical_agent import TechnicalAgent
 from pricing_agent import PricingAgent
 from report_generator import ReportGenerator
+from tracing import Tracer, span
 
 # --- Page Config ---
 st.set_page_config(page_title="Agentic AI – RFP Automation", layout="wide")
@@ -97,80 +103,236 @@ uploaded_file = st.sidebar.file_uploader(
 )
 run_process = st.sidebar.button(" Run Automation")
 
-st.sidebar.markdown("---")
-st.sidebar.download_button(
-    label=" Download Sample RFP (PDF)",
-    data=open("data/Sample_RFP_Report.pdf", "rb"),
-    file_name="Sample_RFP_Report.pdf"
-)
-
 # --- Default Paths ---
 rfp_path = "data/sample_rfp.json"
 sku_path = "data/mock_skus.csv"
+sample_pdf_path = "data/Sample_RFP_Report.pdf"
 
-# --- Main App Logic ---
-if run_process:
-    with st.spinner("Running AI Agents... please wait "):
-        if uploaded_file is not None:
-            rfp_path = f"data/{uploaded_file.name}"
-            with open(rfp_path, "wb") as f:
-                f.write(uploaded_file.read())
+# Results kept per browser session (oldest dropped beyond this)
+MAX_SESSION_RESULTS = 5
 
-        # Load agents
-        sales = SalesAgent(rfp_path)
-        sales.load_rfp()
-        items = sales.get_rfp_items()
+# Local job service (python job_service.py); runs are computed inline
+# only when it isn't reachable
+service = JobClient(os.environ.get("RFP_SERVICE_URL", "http://127.0.0.1:8765"))
+POLL_SECONDS = 1.0
 
-        tabs = st.tabs([" RFP Summary", " SKU Matches", " Pricing", " Report"])
 
-        with tabs[0]:
-            st.subheader("RFP Summary")
-            st.json(sales.rfp_data)
+@st.cache_data(show_spinner=False)
+def read_file_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
 
-        if not items:
-            st.error(" No items detected in this RFP. Ensure it contains a clear item table or try OCR version.")
-            st.stop()
 
-        # Technical Agent
-        tech = TechnicalAgent(sku_path)
-        tech.load_sku_data()
-        matches_df = tech.match_rfp_items(items)
-        matches_csv = "data/technical_matches.csv"
-        matches_df.to_csv(matches_csv, index=False)
+@st.cache_resource(show_spinner=False)
+def load_technical_agent(path, size, mtime_ns):
+    """
+    One loaded catalog and SKU matrix (what the vectorized matcher reads)
+    per server process, shared read-only by every session. size/mtime_ns
+    make a catalog edit load a fresh copy.
+    """
+    tech = TechnicalAgent(path)
+    tech.load_sku_data()
+    tech.get_sku_matrix()
+    return tech
 
-        with tabs[1]:
-            st.subheader("Top SKU Matches per Item")
-            st.dataframe(matches_df, use_container_width=True)
 
-        # Pricing Agent
-        pricing = PricingAgent(matches_csv)
+def get_technical_agent():
+    stat = os.stat(sku_path)
+    return load_technical_agent(sku_path, stat.st_size, stat.st_mtime_ns)
+
+
+def run_pipeline(rfp_name, rfp_bytes, tech):
+    """Run all agents on an in-memory RFP; every output stays in memory"""
+    with Tracer() as tracer:
+        result = run_stages(rfp_name, rfp_bytes, tech)
+    result["trace"] = tracer.breakdown()
+    return result
+
+
+def run_stages(rfp_name, rfp_bytes, tech):
+    with span("sales"):
+        sales = SalesAgent(rfp_name, rfp_bytes=rfp_bytes)
+        sales.load_rfp()
+        items = sales.get_rfp_items()
+    result = {"rfp_data": sales.rfp_data, "items": len(items)}
+    if not items:
+        return result
+
+    with span("technical"):
+        matches_df = tech.match_rfp_items(items)
+
+    with span("pricing"):
+        pricing = PricingAgent(matches_df)
         pricing.load_matches()
         top_df = pricing.select_top_matches()
         final_df = pricing.calculate_costs(top_df)
-        pricing_csv = "data/final_pricing_summary.csv"
-        final_df.to_csv(pricing_csv, index=False)
 
-        with tabs[2]:
-            st.subheader("Final Pricing Summary")
-            st.dataframe(final_df, use_container_width=True)
-
-        # Report Generator
-        ppt_path = "data/Generated_RFP_Report.pptx"
+    with span("report"):
         ppt = ReportGenerator("Industrial Cable Supply (Demo)", final_df)
         ppt.add_title_slide()
         ppt.add_process_flow()
         ppt.add_match_summary()
         ppt.add_pricing_summary()
         ppt.add_conclusion_slide()
-        ppt.save_ppt(ppt_path)
-
-        with tabs[3]:
-            st.success("Workflow Completed Successfully!")
-            st.download_button(
-                label="Download PPT Report",
-                data=open(ppt_path, "rb"),
-                file_name="Generated_RFP_Report.pptx"
-            )
+        ppt_bytes = ppt.to_bytes()
+
+    result.update({
+        "matches_df": matches_df,
+        "final_df": final_df,
+        "matches_csv": matches_df.to_csv(index=False).encode("utf-8"),
+        "pricing_csv": final_df.to_csv(index=False).encode("utf-8"),
+        "ppt_bytes": ppt_bytes,
+    })
+    return result
+
+
+def fetch_job_result(job_id):
+    """Turn a finished service job into the same result dict run_pipeline builds"""
+    data = service.result(job_id)
+    matches_csv = data["matches_csv"].encode("utf-8")
+    pricing_csv = data["pricing_csv"].encode("utf-8")
+    return {
+        "rfp_data": data["rfp_data"],
+        "items": data["items"],
+        "matches_df": pd.read_csv(io.BytesIO(matches_csv)),
+        "final_df": pd.read_csv(io.BytesIO(pricing_csv)),
+        "matches_csv": matches_csv,
+        "pricing_csv": pricing_csv,
+        "ppt_bytes": service.report(job_id),
+        "timings": data["timings"],
+        "trace": data.get("trace", []),
+    }
+
+
+def store_result(result_key, result):
+    session_results[result_key] = result
+    while len(session_results) > MAX_SESSION_RESULTS:
+        session_results.pop(next(iter(session_results)))
+    st.session_state["last_result"] = result_key
+
+
+st.sidebar.markdown("---")
+st.sidebar.download_button(
+    label=" Download Sample RFP (PDF)",
+    data=read_file_bytes(sample_pdf_path),
+    file_name="Sample_RFP_Report.pdf"
+)
+
+# --- Main App Logic ---
+session_results = st.session_state.setdefault("results", {})
+
+def run_inline(result_key, rfp_name, rfp_bytes):
+    with st.spinner("Running AI Agents... please wait "):
+        store_result(result_key, run_pipeline(rfp_name, rfp_bytes, get_technical_agent()))
+
+
+if run_process:
+    if uploaded_file is not None:
+        rfp_name, rfp_bytes = uploaded_file.name, uploaded_file.getvalue()
+    else:
+        rfp_name, rfp_bytes = rfp_path, read_file_bytes(rfp_path)
+
+    # Same upload + same catalog file in this session → reuse the previous run
+    # (the catalog is identified like load_technical_agent does, without loading it)
+    stat = os.stat(sku_path)
+    result_key = (hashlib.sha256(rfp_bytes).hexdigest(), os.path.splitext(rfp_name)[1],
+                  sku_path, stat.st_size, stat.st_mtime_ns)
+    if result_key in session_results:
+        st.session_state["last_result"] = result_key
+    elif service.available():
+        try:
+            job = service.submit(rfp_name, rfp_bytes)
+            st.session_state["pending_job"] = (result_key, job["job_id"], rfp_name, rfp_bytes)
+        except (OSError, RuntimeError) as e:
+            # e.g. 503 when the service queue is full
+            st.sidebar.warning(f"Job service rejected the run ({e}); running in this session.")
+            run_inline(result_key, rfp_name, rfp_bytes)
+    else:
+        st.sidebar.warning("Job service not reachable; running in this session.")
+        run_inline(result_key, rfp_name, rfp_bytes)
+
+# --- Poll the submitted job without blocking other sessions ---
+pending = st.session_state.get("pending_job")
+if pending is not None:
+    result_key, job_id, rfp_name, rfp_bytes = pending
+    try:
+        status = service.status(job_id)
+        if status["state"] == "done":
+            result = fetch_job_result(job_id)
+    except (OSError, RuntimeError) as e:
+        # Service restarted or the job was dropped (MAX_FINISHED_JOBS)
+        del st.session_state["pending_job"]
+        st.error(f" Lost track of job {job_id} ({e}); running in this session.")
+        run_inline(result_key, rfp_name, rfp_bytes)
+    else:
+        if status["state"] == "done":
+            del st.session_state["pending_job"]
+            store_result(result_key, result)
+        elif status["state"] in ("failed", "cancelled"):
+            del st.session_state["pending_job"]
+            st.error(f" Job {status['state']}: {status['error'] or 'cancelled by user'}")
+            st.stop()
+        else:
+            stage = status["stage"] or "queued"
+            st.progress(status["progress"], text=f"Running AI Agents... ({stage})")
+            if st.button("Cancel run"):
+                try:
+                    service.cancel(job_id)
+                except (OSError, RuntimeError) as e:
+                    st.error(f" Could not cancel job {job_id}: {e}")
+            time.sleep(POLL_SECONDS)
+            st.rerun()
+
+result = session_results.get(st.session_state.get("last_result"))
+
+if result is not None:
+    tabs = st.tabs([" RFP Summary", " SKU Matches", " Pricing", " Report", " Run Metrics"])
+
+    with tabs[0]:
+        st.subheader("RFP Summary")
+        rfp_data = result["rfp_data"]
+        st.json(dict(rfp_data, items=list(rfp_data.get("items", []))))
+
+    if not result["items"]:
+        st.error(" No items detected in this RFP. Ensure it contains a clear item table (scanned pages need Tesseract and Poppler installed for OCR).")
+        st.stop()
+
+    with tabs[1]:
+        st.subheader("Top SKU Matches per Item")
+        st.dataframe(result["matches_df"], use_container_width=True)
+        st.download_button(
+            label="Download Matches (CSV)",
+            data=result["matches_csv"],
+            file_name="technical_matches.csv",
+            mime="text/csv"
+        )
+
+    with tabs[2]:
+        st.subheader("Final Pricing Summary")
+        st.dataframe(result["final_df"], use_container_width=True)
+        st.download_button(
+            label="Download Pricing (CSV)",
+            data=result["pricing_csv"],
+            file_name="final_pricing_summary.csv",
+            mime="text/csv"
+        )
+
+    with tabs[3]:
+        st.success("Workflow Completed Successfully!")
+        st.download_button(
+            label="Download PPT Report",
+            data=result["ppt_bytes"],
+            file_name="Generated_RFP_Report.pptx"
+        )
+
+    with tabs[4]:
+        st.subheader("Per-Stage Timing")
+        trace = pd.DataFrame(result.get("trace") or [])
+        if trace.empty:
+            st.info("No timing data recorded for this run.")
+        else:
+            st.bar_chart(trace[trace["depth"] == 0].set_index("span")["wall_s"])
+            trace["span"] = ["  " * d + name for d, name in zip(trace["depth"], trace["span"])]
+            st.dataframe(trace.drop(columns="depth"), use_container_width=True)
 else:
     st.info("Upload an RFP file (PDF/JSON) and click **Run Automation** to start.")
-
@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class ArtifactSink:
+    """
+    Writes intermediate pipeline artifacts (CSV files) on a background
+    thread so the next stage can start without waiting on disk I/O.
+    Call close() (or use it as a context manager) to wait for pending writes.
+    With max_pending set, a write waits while that many are still queued,
+    so a fast producer can't pile up frames in memory.
+    """
+
+    def __init__(self, max_pending=None):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-sink")
+        self._pending = []
+        self.max_pending = max_pending
+
+    def write_csv(self, df, path, label="Artifact", append=False):
+        """
+        Queue df.to_csv(path); df must not be modified afterwards.
+        append=True adds the rows (no header) to a file written before.
+        """
+        if self.max_pending:
+            queued = [f for f in self._pending if not f.done()]
+            if len(queued) >= self.max_pending:
+                wait(queued[:len(queued) - self.max_pending + 1])
+        self._pending.append(self._executor.submit(self._write_csv, df, path, label, append))
+
+    @staticmethod
+    def _write_csv(df, path, label, append=False):
+        if append:
+            df.to_csv(path, mode="a", header=False, index=False)
+        else:
+            df.to_csv(path, index=False)
+            print(f"{label} saved to {path}")
+        return path
+
+    def close(self):
+        """Wait for queued writes; returns the paths written and prints any failures"""
+        self._executor.shutdown(wait=True)
+        written = []
+        for future in self._pending:
+            try:
+                written.append(future.result())
+            except Exception as e:
+                print(f" Error writing artifact: {e}")
+        self._pending = []
+        return written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,230 @@
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from catalog_cache import CatalogCache
+from sales_agent import SalesAgent
+from technical_agent import TechnicalAgent
+from pricing_agent import PricingAgent
+from report_generator import ReportGenerator
+from result_store import ResultStore
+from rfp_items import json_default
+
+RFP_EXTENSIONS = (".json", ".pdf")
+STAGES = ["sales", "technical", "pricing", "report"]
+
+# Catalog loaded once per worker process by init_worker (memory-mapped,
+# so the pages are shared between workers by the OS)
+_worker_tech = None
+
+
+def discover_rfps(source):
+    """
+    RFP paths from a directory (every .json/.pdf in it), a manifest
+    (.txt with one path per line, or a .json list of paths; relative
+    paths resolve against the manifest's folder) or a single RFP file.
+    """
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source)
+                      if name.lower().endswith(RFP_EXTENSIONS))
+
+    base = os.path.dirname(os.path.abspath(source))
+    if source.endswith(".txt"):
+        with open(source) as f:
+            entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    elif source.endswith(".json"):
+        with open(source) as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            return [source]  # a single JSON RFP, not a manifest
+    else:
+        return [source]
+    return [entry if os.path.isabs(entry) else os.path.join(base, entry) for entry in entries]
+
+
+def output_dirs(rfp_paths, out_root):
+    """One output folder per RFP, named after the file (suffixed on clashes)"""
+    seen = {}
+    dirs = []
+    for path in rfp_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        seen[stem] = seen.get(stem, 0) + 1
+        name = stem if seen[stem] == 1 else f"{stem}_{seen[stem]}"
+        dirs.append(os.path.join(out_root, name))
+    return dirs
+
+
+def init_worker(sku_path):
+    global _worker_tech
+    _worker_tech = TechnicalAgent(sku_path)
+    _worker_tech.load_sku_data()
+    _worker_tech.get_sku_matrix()
+
+
+def worker_tech():
+    """TechnicalAgent loaded by init_worker in this process"""
+    return _worker_tech
+
+
+def process_rfp(task):
+    """Run Sales → Technical → Pricing → Report for one RFP; never raises"""
+    rfp_path, out_dir, top_k, quantity, history_dir = task
+    timings = {}
+    result = {"rfp": rfp_path, "out_dir": out_dir, "status": "ok", "timings": timings}
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+
+        start = time.perf_counter()
+        sales = SalesAgent(rfp_path, ocr_workers=1)  # already one of the batch worker processes
+        sales.load_rfp()
+        items = sales.get_rfp_items()
+        timings["sales"] = time.perf_counter() - start
+        if not items:
+            raise ValueError("no items parsed from RFP")
+        # Kept so catalog_diff can patch these results without re-parsing
+        with open(os.path.join(out_dir, "rfp_data.json"), "w") as f:
+            json.dump(sales.rfp_data, f, indent=2, default=json_default)
+
+        start = time.perf_counter()
+        matches_df = _worker_tech.match_rfp_items(items, top_k=top_k)
+        matches_df.to_csv(os.path.join(out_dir, "technical_matches.csv"), index=False)
+        timings["technical"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pricing = PricingAgent(matches_df)
+        pricing.load_matches()
+        top_df = pricing.select_top_matches()
+        final_df = pricing.calculate_costs(top_df, quantity_per_item=quantity)
+        final_df.to_csv(os.path.join(out_dir, "final_pricing_summary.csv"), index=False)
+        timings["pricing"] = time.perf_counter() - start
+
+        if history_dir:
+            try:
+                store = ResultStore(history_dir)
+                rfp_id = sales.rfp_data.get("id", "RFP-UNKNOWN")
+                version = _worker_tech.catalog_version
+                store.append("matches", matches_df, rfp_id, items=items, catalog_version=version)
+                store.append("pricing", final_df, rfp_id, items=items, catalog_version=version)
+            except Exception as e:
+                result["history_error"] = f"{type(e).__name__}: {e}"
+
+        start = time.perf_counter()
+        ppt = ReportGenerator(sales.rfp_data.get("title", "RFP"), final_df).build()
+        ppt.save_ppt(os.path.join(out_dir, "RFP_Report.pptx"))
+        timings["report"] = time.perf_counter() - start
+
+        result["items"] = len(items)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    return result
+
+
+def failed_result(task, error):
+    """process_rfp-style result for an RFP whose worker never returned"""
+    rfp_path, out_dir = task[:2]
+    return {"rfp": rfp_path, "out_dir": out_dir, "status": "failed", "timings": {},
+            "error": f"{type(error).__name__}: {error}"}
+
+
+def run_tasks(tasks, workers, sku_path):
+    """
+    process_rfp over every task in a worker pool. If a worker process dies
+    (BrokenProcessPool fails every unfinished task), the unfinished tasks
+    are rerun one at a time in a fresh pool: the first one that breaks it
+    again is recorded as failed and the rest go back to the full pool.
+    """
+    results = {}
+    pending = list(range(len(tasks)))
+    pool_workers = workers
+    while pending:
+        broken = []
+        with ProcessPoolExecutor(max_workers=pool_workers, initializer=init_worker,
+                                 initargs=(sku_path,)) as pool:
+            futures = {pool.submit(process_rfp, tasks[i]): i for i in pending}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except BrokenProcessPool as e:
+                    broken.append((i, e))
+                except Exception as e:
+                    results[i] = failed_result(tasks[i], e)
+        broken.sort(key=lambda entry: entry[0])
+        if broken and pool_workers == 1:
+            # One worker runs tasks in order, so the first unfinished one killed it
+            i, e = broken.pop(0)
+            print(f"  ❌ Worker process died on {tasks[i][0]}")
+            results[i] = failed_result(tasks[i], e)
+            pool_workers = workers
+        elif broken:
+            print(f"⚠️ A worker process died; retrying {len(broken)} unfinished RFPs one at a time...")
+            pool_workers = 1
+        pending = [i for i, _ in broken]
+    return [results[i] for i in range(len(tasks))]
+
+
+def summarize(results, elapsed):
+    """Throughput and per-stage p50/p95 latency of a finished batch"""
+    done = [r for r in results if r["status"] == "ok"]
+    summary = {
+        "rfps": len(results),
+        "succeeded": len(done),
+        "failed": len(results) - len(done),
+        "elapsed_s": round(elapsed, 3),
+        "rfps_per_min": round(len(done) / elapsed * 60, 2) if elapsed > 0 else None,
+        "stages": {},
+    }
+    for stage in STAGES:
+        values = [r["timings"][stage] for r in done if stage in r["timings"]]
+        if values:
+            summary["stages"][stage] = {
+                "p50_s": round(float(np.percentile(values, 50)), 4),
+                "p95_s": round(float(np.percentile(values, 95)), 4),
+            }
+    return summary
+
+
+def print_summary(summary, results):
+    print("\nBatch summary")
+    print("-" * 50)
+    print(f"RFPs: {summary['rfps']}  succeeded: {summary['succeeded']}  failed: {summary['failed']}")
+    print(f"Elapsed: {summary['elapsed_s']}s  throughput: {summary['rfps_per_min']} RFPs/min")
+    for stage, stats in summary["stages"].items():
+        print(f"  {stage:<10} p50 {stats['p50_s']:.4f}s   p95 {stats['p95_s']:.4f}s")
+    for r in results:
+        if r["status"] != "ok":
+            print(f"  ❌ {r['rfp']}: {r['error']}")
+    print("-" * 50)
+
+
+def run_batch(source, out_root, sku_path, workers=None, top_k=3, quantity=100, history_dir=None):
+    """
+    Process every RFP from `source` with a pool of worker processes that
+    share one compiled SKU catalog. Writes per-RFP outputs under out_root
+    plus batch_summary.json, and returns (summary, per-RFP results).
+    With history_dir, matches and pricing are also appended to that ResultStore.
+    """
+    rfp_paths = discover_rfps(source)
+    dirs = output_dirs(rfp_paths, out_root)
+    os.makedirs(out_root, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    # Compile the catalog once up front so workers only memory-map it
+    CatalogCache(sku_path).open()
+
+    print(f"Processing {len(rfp_paths)} RFPs with {workers} workers...")
+    start = time.perf_counter()
+    tasks = [(path, out_dir, top_k, quantity, history_dir) for path, out_dir in zip(rfp_paths, dirs)]
+    results = run_tasks(tasks, workers, sku_path)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results, elapsed)
+    with open(os.path.join(out_root, "batch_summary.json"), "w") as f:
+        json.dump({"summary": summary, "results": results}, f, indent=2)
+    print_summary(summary, results)
+    return summary, results
@@ -0,0 +1,247 @@
+"""
+Pipeline benchmarks over a matrix of synthetic catalog and RFP sizes.
+
+    python -m benchmarks.run run --matrix small --out benchmarks/results.json
+    python -m benchmarks.run compare benchmarks/baseline.json benchmarks/results.json
+
+Each case times every stage (best of --repeat runs) and records its peak
+traced memory in a separate run, then does the same for MasterAgent.run.
+compare exits with status 1 when any stage regressed past the threshold.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import generate_catalog, generate_rfp, write_json_rfp, write_pdf_rfp
+from sales_agent import SalesAgent
+from technical_agent import TechnicalAgent
+from pricing_agent import PricingAgent
+from report_generator import ReportGenerator
+from main import MasterAgent
+from result_store import ResultStore
+
+# (catalog rows, RFP items) per matrix; each case runs for JSON and PDF RFPs
+MATRICES = {
+    "smoke": [(1_000, 10)],
+    "small": [(1_000, 10), (10_000, 100), (10_000, 1_000)],
+    "medium": [(10_000, 100), (100_000, 100), (100_000, 1_000), (100_000, 5_000)],
+    "large": [(100_000, 1_000), (1_000_000, 100), (1_000_000, 1_000), (1_000_000, 5_000)],
+}
+FORMATS = ("json", "pdf")
+STAGES = ["sales", "catalog_load", "technical", "pricing", "report", "master"]
+
+# compare ignores differences smaller than these (timer and allocator noise)
+MIN_TIME_DELTA_S = 0.005
+MIN_MEMORY_DELTA_MB = 1.0
+
+
+def measure(fn, repeat):
+    """Best and median wall time over `repeat` runs plus peak traced memory of one extra run"""
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "wall_s": round(min(times), 6),
+        "median_s": round(float(np.median(times)), 6),
+        "peak_mb": round(peak / 1e6, 3),
+    }
+
+
+def run_case(workdir, catalog_rows, items, fmt, repeat, seed):
+    """Generate one case's data under workdir and measure every stage"""
+    sku_path = os.path.join(workdir, f"skus_{catalog_rows}.csv")
+    if not os.path.exists(sku_path):
+        generate_catalog(catalog_rows, seed=seed).to_csv(sku_path, index=False)
+    rfp = generate_rfp(items, seed=seed)
+    rfp_path = os.path.join(workdir, f"rfp_{items}.{fmt}")
+    if fmt == "json":
+        write_json_rfp(rfp, rfp_path)
+    else:
+        write_pdf_rfp(rfp, rfp_path)
+
+    # Compile the catalog cache outside the measurements, as a long-running service would
+    cache_dir = os.path.join(workdir, "catalog_cache")
+    state = {}
+
+    def sales():
+        agent = SalesAgent(rfp_path)
+        agent.load_rfp()
+        state["items"] = agent.get_rfp_items()
+        state["title"] = agent.rfp_data.get("title", "RFP")
+
+    def catalog_load():
+        tech = TechnicalAgent(sku_path, cache_dir=cache_dir)
+        tech.load_sku_data()
+        tech.get_sku_matrix()
+        state["tech"] = tech
+
+    def technical():
+        state["matches"] = state["tech"].match_rfp_items(state["items"], top_k=3)
+
+    def pricing():
+        agent = PricingAgent(state["matches"])
+        state["final"] = agent.calculate_costs(agent.select_top_matches())
+
+    def report():
+        ReportGenerator(state["title"], state["final"]).build().to_bytes()
+
+    def master():
+        agent = MasterAgent(write_artifacts=True, use_cache=False)
+        agent.rfp_path = rfp_path
+        agent.sku_path = sku_path
+        agent.tech_output = os.path.join(workdir, "technical_matches.csv")
+        agent.pricing_output = os.path.join(workdir, "final_pricing_summary.csv")
+        agent.report_output = os.path.join(workdir, "report.pptx")
+        agent.history = ResultStore(os.path.join(workdir, "history"))
+        agent.run()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        catalog_load()
+        TechnicalAgent(sku_path).load_sku_data()  # MasterAgent uses the default cache dir
+
+    stages = {}
+    for name, fn in zip(STAGES, (sales, catalog_load, technical, pricing, report, master)):
+        stages[name] = measure(fn, repeat)
+    return {
+        "case": f"catalog{catalog_rows}-items{items}-{fmt}",
+        "catalog_rows": catalog_rows,
+        "items": items,
+        "format": fmt,
+        "matched_items": len(state["items"]),
+        "stages": stages,
+    }
+
+
+def environment():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def run_benchmarks(matrix, formats=FORMATS, repeat=3, seed=0, out=None, workdir=None):
+    cases = MATRICES[matrix]
+    owns_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="rfp_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    try:
+        for catalog_rows, items in cases:
+            for fmt in formats:
+                result = run_case(workdir, catalog_rows, items, fmt, repeat, seed)
+                results.append(result)
+                summary = "  ".join(f"{stage} {stats['wall_s']:.3f}s/{stats['peak_mb']:.0f}MB"
+                                    for stage, stats in result["stages"].items())
+                print(f"{result['case']:<32} {summary}")
+    finally:
+        if owns_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"matrix": matrix, "repeat": repeat, "seed": seed, "environment": environment(), "results": results}
+    if out:
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {out}")
+    return report
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Stage-level regressions of `current` against `baseline` (both result
+    dicts): wall time or peak memory grown by more than `threshold`.
+    """
+    base_cases = {r["case"]: r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        base = base_cases.get(result["case"])
+        if base is None:
+            continue
+        for stage, stats in result["stages"].items():
+            old = base["stages"].get(stage)
+            if old is None:
+                continue
+            for metric, floor in (("wall_s", MIN_TIME_DELTA_S), ("peak_mb", MIN_MEMORY_DELTA_MB)):
+                delta = stats[metric] - old[metric]
+                if delta > floor and stats[metric] > old[metric] * (1 + threshold):
+                    regressions.append({
+                        "case": result["case"], "stage": stage, "metric": metric,
+                        "baseline": old[metric], "current": stats[metric],
+                        "change": round(delta / old[metric], 3) if old[metric] else None,
+                    })
+    return regressions
+
+
+def print_comparison(regressions, threshold):
+    if not regressions:
+        print(f"No regressions above {threshold:.0%}.")
+        return
+    print(f"{len(regressions)} regression(s) above {threshold:.0%}:")
+    for r in regressions:
+        change = f"+{r['change']:.0%}" if r["change"] is not None else "new"
+        print(f"  {r['case']:<32} {r['stage']:<13} {r['metric']:<8} "
+              f"{r['baseline']} -> {r['current']} ({change})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RFP pipeline benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmark matrix")
+    run.add_argument("--matrix", choices=sorted(MATRICES), default="small")
+    run.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--out", default="benchmarks/results.json")
+    run.add_argument("--workdir", default=None, help="keep generated data here instead of a temp dir")
+    run.add_argument("--baseline", default=None, help="compare against this results file when done")
+    run.add_argument("--threshold", type=float, default=0.2)
+
+    cmp = commands.add_parser("compare", help="flag regressions against a stored baseline")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown (0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        current = run_benchmarks(args.matrix, args.formats, args.repeat, args.seed, args.out, args.workdir)
+        if not args.baseline:
+            return 0
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    print_comparison(regressions, args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Scaling of engine="sharded" against the single-process vectorized engine.
+
+    python -m benchmarks.sharded --skus 1000000 --items 1000
+    python -m benchmarks.sharded --workers 1 2 4 8 --out benchmarks/sharded.json
+
+Matches one synthetic RFP against a synthetic catalog with every worker
+count (best of --repeat runs, pool start-up and shared memory copy timed
+separately) and reports speedup and parallel efficiency over the
+vectorized engine. Each worker count is also checked on a copy of the
+RFP with some numeric specs given as strings (as JSON tenders may send
+them). Exits with status 1 if any sharded result differs from the
+vectorized one.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import pandas as pd
+from benchmarks.synthetic import generate_catalog, generate_rfp
+from technical_agent import TechnicalAgent
+
+
+def default_workers():
+    """1, 2, 4, ... up to the CPU count (and the CPU count itself)"""
+    cpus = os.cpu_count() or 1
+    counts, n = [], 1
+    while n < cpus:
+        counts.append(n)
+        n *= 2
+    return counts + [cpus]
+
+
+def best_time(fn, repeat):
+    """(best wall time, last result) over `repeat` runs"""
+    best, result = None, None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def string_specs(items, every=3):
+    """Copy of items with the numeric specs of every `every`-th item as strings"""
+    out = []
+    for i, item in enumerate(items):
+        if i % every == 0:
+            specs = {k: f"{v:g}" if isinstance(v, (int, float)) else v for k, v in item["specs"].items()}
+            item = dict(item, specs=specs)
+        out.append(item)
+    return out
+
+
+def run(skus, items, workers, top_k=3, repeat=3, seed=0):
+    """Timings per engine / worker count; returns (rows, mismatches)"""
+    tech = TechnicalAgent("synthetic.csv")
+    tech.sku_df = generate_catalog(skus, seed)
+    tech.get_sku_matrix()
+    rfp_items = generate_rfp(items, seed + 1)["items"]
+
+    mixed_items = string_specs(rfp_items)
+
+    def match(engine, items=rfp_items):
+        return lambda: tech.match_rfp_items(items, top_k=top_k, engine=engine, dedupe=False)
+
+    baseline, expected = best_time(match("vectorized"), repeat)
+    _, expected_mixed = best_time(match("vectorized", mixed_items), 1)
+    print(f"vectorized      {baseline:8.3f} s  ({skus} SKUs x {items} items)")
+    rows = [{"engine": "vectorized", "workers": 1, "seconds": round(baseline, 4)}]
+    mismatches = []
+    try:
+        for n in workers:
+            start = time.perf_counter()
+            tech.build_sharded(workers=n)
+            startup = time.perf_counter() - start
+            # First call also waits for every worker to map the catalog
+            best_time(match("sharded"), 1)
+            seconds, frame = best_time(match("sharded"), repeat)
+            _, frame_mixed = best_time(match("sharded", mixed_items), 1)
+            speedup = baseline / seconds
+            try:
+                pd.testing.assert_frame_equal(frame, expected)
+                pd.testing.assert_frame_equal(frame_mixed, expected_mixed)
+                status = "ok"
+            except AssertionError:
+                status = "MISMATCH"
+                mismatches.append(n)
+            print(f"sharded x{n:<6} {seconds:8.3f} s  speedup {speedup:5.2f}  efficiency {speedup / n:5.0%}  "
+                  f"start-up {startup:6.3f} s  {status}")
+            rows.append({"engine": "sharded", "workers": n, "seconds": round(seconds, 4),
+                         "startup_seconds": round(startup, 4), "speedup": round(speedup, 3),
+                         "efficiency": round(speedup / n, 3), "identical": status == "ok"})
+    finally:
+        tech.close_sharded()
+    return rows, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded matching scaling benchmark")
+    parser.add_argument("--skus", type=int, default=200_000)
+    parser.add_argument("--items", type=int, default=1_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="worker counts to run (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="also save the rows as JSON here")
+    args = parser.parse_args(argv)
+
+    print(f"CPUs: {os.cpu_count()}")
+    rows, mismatches = run(args.skus, args.items, args.workers or default_workers(), args.top_k,
+                           args.repeat, args.seed)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"skus": args.skus, "items": args.items, "cpus": os.cpu_count(), "rows": rows}, f, indent=2)
+        print(f"Saved results to {args.out}")
+    if mismatches:
+        print(f"Sharded results differ from vectorized with {mismatches} workers.")
+        return 1
+    print("Sharded results identical to vectorized.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Cold-start budget for the CLI and the agent modules.
+
+    python -m benchmarks.startup              # check every entry point
+    python -m benchmarks.startup --top 10     # plus the heaviest packages of each
+
+Every check runs in a fresh interpreter under `python -X importtime`. The
+median import time of --repeat runs must stay within the check's budget,
+and the check must not load any of its forbidden modules (the heavy
+optional dependencies: pandas, python-pptx, pdfplumber, pyarrow).
+Exits with status 1 when any check fails.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("pandas", "pptx", "pdfplumber", "pdfminer", "pyarrow")
+
+# name -> (code to run, import budget in ms, modules it must not load).
+# Budgets leave headroom over numpy (~100 ms) but not over pandas (~350 ms).
+CHECKS = {
+    "main": ("import main", 300, HEAVY),
+    "batch_runner": ("import batch_runner", 300, HEAVY),
+    "job_service": ("import job_service", 300, HEAVY),
+    "sales_agent": ("import sales_agent", 250, HEAVY),
+    "technical_agent": ("import technical_agent", 300, HEAVY),
+    "pricing_agent": ("import pricing_agent", 250, HEAVY),
+    "report_generator": ("import report_generator", 100, HEAVY),
+    "json_rfp": ("from sales_agent import SalesAgent\n"
+                 "SalesAgent('data/sample_rfp.json').load_rfp()", 250, HEAVY),
+}
+
+
+def parse_importtime(stderr):
+    """(total ms of imports after interpreter startup, {module: self ms}) from -X importtime output"""
+    total_us = 0
+    self_us = {}
+    started = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        module = name.strip()
+        if not started:
+            # Everything up to and including `site` is interpreter startup
+            started = module == "site" and not name.startswith("  ")
+            continue
+        self_us[module] = int(own)
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative)
+    return total_us / 1000, {m: us / 1000 for m, us in self_us.items()}
+
+
+def run_check(code):
+    """Run code in a fresh interpreter; returns (import ms, {module: self ms}, loaded module names)"""
+    script = code + "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=REPO_ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    total_ms, self_ms = parse_importtime(proc.stderr)
+    modules = json.loads(proc.stdout.strip().splitlines()[-1])
+    return total_ms, self_ms, modules
+
+
+def by_package(self_ms):
+    """Self import time summed per top-level package, heaviest first"""
+    totals = defaultdict(float)
+    for module, ms in self_ms.items():
+        totals[module.split(".")[0]] += ms
+    return sorted(totals.items(), key=lambda kv: -kv[1])
+
+
+def run_checks(names=None, repeat=3, top=0, scale=1.0):
+    """Run the checks and print one line each; returns the failures"""
+    failures = []
+    for name in names or CHECKS:
+        code, budget, forbidden = CHECKS[name]
+        budget *= scale
+        runs = [run_check(code) for _ in range(repeat)]
+        median = statistics.median(total for total, _, _ in runs)
+        loaded = sorted({m.split(".")[0] for m in runs[0][2]} & set(forbidden))
+        problems = []
+        if median > budget:
+            problems.append(f"over budget by {median - budget:.0f} ms")
+        if loaded:
+            problems.append(f"loads {', '.join(loaded)}")
+        status = "FAIL" if problems else "ok"
+        print(f"{status:<4} {name:<18} {median:7.1f} ms  (budget {budget:.0f} ms)  {'; '.join(problems)}")
+        if top:
+            for package, ms in by_package(runs[0][1])[:top]:
+                print(f"       {package:<28} {ms:7.1f} ms")
+        if problems:
+            failures.append({"check": name, "median_ms": round(median, 1), "budget_ms": budget,
+                             "problems": problems})
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start import budget check")
+    parser.add_argument("checks", nargs="*", help=f"checks to run (default: all of {', '.join(CHECKS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per check (median is used)")
+    parser.add_argument("--top", type=int, default=0, help="show the N heaviest packages per check")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (slow machines)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown check(s): {', '.join(unknown)}")
+    failures = run_checks(args.checks, args.repeat, args.top, args.scale)
+    if failures:
+        print(f"{len(failures)} startup check(s) failed.")
+        return 1
+    print("All startup checks within budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Seeded synthetic data for the benchmarks: SKU catalogs, JSON RFPs and
+table-bearing PDF RFPs. The same seed always produces the same files.
+"""
+import json
+import numpy as np
+import pandas as pd
+
+# Standard conductor cross-sections (mm²), small sizes are the most common
+CONDUCTOR_SIZES = np.array([1.5, 2.5, 4, 6, 10, 16, 25, 35, 50, 70, 95, 120, 150, 185, 240, 300, 400])
+CONDUCTOR_WEIGHTS = np.array([14, 14, 11, 10, 10, 8, 7, 5, 5, 4, 3, 3, 2, 1.5, 1, 0.8, 0.7])
+
+VOLTAGES_KV = np.array([0.5, 0.66, 1.1, 3.3, 6.6, 11, 22, 33])
+VOLTAGE_WEIGHTS = np.array([10, 25, 35, 10, 7, 8, 3, 2])
+
+INSULATIONS = np.array(["XLPE", "PVC", "EPR", "LSZH"])
+INSULATION_WEIGHTS = np.array([45, 40, 8, 7])
+# Temperature ratings (°C) offered per insulation, with their weights
+TEMPERATURES = {
+    "XLPE": ([90, 105], [85, 15]),
+    "PVC": ([70, 85, 105], [75, 20, 5]),
+    "EPR": ([90, 105], [70, 30]),
+    "LSZH": ([70, 90], [40, 60]),
+}
+FAMILIES = np.array(["PowerFlex", "Control", "ArmourPro", "ArmourLite", "Generic", "FlexiCore"])
+CORES = np.array([1, 2, 3, 4, 5])
+
+
+def _choice(rng, values, weights, size):
+    weights = np.asarray(weights, dtype=float)
+    return rng.choice(values, size=size, p=weights / weights.sum())
+
+
+def _specs(rng, n):
+    """Column arrays of n realistic (conductor, insulation, voltage, temperature) specs"""
+    conductor = _choice(rng, CONDUCTOR_SIZES, CONDUCTOR_WEIGHTS, n)
+    insulation = _choice(rng, INSULATIONS, INSULATION_WEIGHTS, n)
+    voltage = _choice(rng, VOLTAGES_KV, VOLTAGE_WEIGHTS, n)
+    temperature = np.empty(n, dtype=np.int64)
+    for name, (values, weights) in TEMPERATURES.items():
+        mask = insulation == name
+        temperature[mask] = _choice(rng, values, weights, int(mask.sum()))
+    return conductor, insulation, voltage, temperature
+
+
+def generate_catalog(rows, seed=0):
+    """SKU catalog DataFrame with the columns of data/mock_skus.csv"""
+    rng = np.random.default_rng(seed)
+    conductor, insulation, voltage, temperature = _specs(rng, rows)
+    family = _choice(rng, FAMILIES, np.ones(len(FAMILIES)), rows)
+    armoured = np.char.startswith(family.astype(str), "Armour")
+
+    # Price grows with copper and voltage class; armour and XLPE cost extra
+    price = (40 + 95 * conductor ** 0.92) * (1 + 0.12 * np.log1p(voltage))
+    price *= np.where(armoured, 1.35, 1.0) * np.where(insulation == "XLPE", 1.1, 1.0)
+    price *= rng.lognormal(0.0, 0.08, rows)
+
+    names = pd.Series(family).str.cat(
+        [pd.Series(conductor).map("{:g}mm2".format), pd.Series(insulation)], sep=" ")
+    return pd.DataFrame({
+        "sku": [f"SKU-{i:07d}" for i in range(rows)],
+        "product_name": names,
+        "conductor_mm2": conductor,
+        "insulation": insulation,
+        "voltage_kv": voltage,
+        "temperature_rating_C": temperature,
+        "unit_price": np.round(price, 2),
+    })
+
+
+def generate_rfp(items, seed=0):
+    """RFP dict in the format of data/sample_rfp.json"""
+    rng = np.random.default_rng(seed)
+    conductor, insulation, voltage, temperature = _specs(rng, items)
+    cores = rng.choice(CORES, size=items)
+    kinds = rng.choice(np.array(["Power", "Control", "Armoured"]), size=items)
+    return {
+        "id": f"RFP-SYN-{seed:04d}",
+        "title": f"Synthetic Cable Tender {seed} ({items} items)",
+        "due_date": "2026-12-31",
+        "buyer": "Benchmark Utilities Ltd",
+        "items": [
+            {
+                "item_id": f"I{i + 1}",
+                "description": f"{kinds[i]} Cable {cores[i]}-core {conductor[i]:g}mm2",
+                "specs": {
+                    "conductor_mm2": float(conductor[i]),
+                    "insulation": str(insulation[i]),
+                    "voltage_kv": float(voltage[i]),
+                    "temperature_rating_C": int(temperature[i]),
+                },
+            }
+            for i in range(items)
+        ],
+    }
+
+
+def write_json_rfp(rfp, path):
+    with open(path, "w") as f:
+        json.dump(rfp, f, indent=2)
+
+
+# ---- Minimal PDF writer (Helvetica text + ruled tables pdfplumber can detect) ----
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+COLUMN_WIDTHS = (55, 215, 65, 65, 55, 55)
+ROW_HEIGHT = 16
+
+
+def _pdf_string(text):
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return "(" + escaped + ")"
+
+
+def _text(x, y, value, size=8):
+    return f"BT /F1 {size} Tf {x} {y} Td {_pdf_string(value)} Tj ET\n"
+
+
+def _table(rows, x0=40, y0=700):
+    xs = [x0]
+    for width in COLUMN_WIDTHS:
+        xs.append(xs[-1] + width)
+    bottom = y0 - len(rows) * ROW_HEIGHT
+    parts = []
+    for r, row in enumerate(rows):
+        y = y0 - r * ROW_HEIGHT
+        parts.extend(_text(xs[j] + 3, y - 12, cell) for j, cell in enumerate(row))
+    parts.extend(f"{xs[0]} {y0 - r * ROW_HEIGHT} m {xs[-1]} {y0 - r * ROW_HEIGHT} l S\n" for r in range(len(rows) + 1))
+    parts.extend(f"{x} {y0} m {x} {bottom} l S\n" for x in xs)
+    return "".join(parts)
+
+
+def _pdf_document(contents):
+    """Assemble a PDF from one content stream per page"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(contents))), len(contents)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, content in enumerate(contents):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(content.encode('latin-1'))} >>\nstream\n{content}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def write_pdf_rfp(rfp, path, rows_per_page=40):
+    """Write an RFP as a PDF: metadata lines on page 1, one item table per page"""
+    header = ["Item ID", "Description", "Conductor", "Insulation", "Voltage", "Temp"]
+    items = rfp["items"]
+    contents = []
+    for start in range(0, max(len(items), 1), rows_per_page):
+        content = ""
+        if start == 0:
+            content += _text(40, 760, f"Project: {rfp['title']}", 12)
+            content += _text(40, 745, f"Client: {rfp['buyer']}", 9)
+            content += _text(40, 732, f"RFP ID: {rfp['id']}", 9)
+            content += _text(40, 719, f"Due Date: {rfp['due_date']}", 9)
+        rows = [header]
+        for item in items[start:start + rows_per_page]:
+            specs = item["specs"]
+            rows.append([item["item_id"], item["description"], f"{specs['conductor_mm2']:g}",
+                         specs["insulation"], f"{specs['voltage_kv']:g}", f"{specs['temperature_rating_C']:g}"])
+        content += _table(rows)
+        contents.append(content)
+    with open(path, "wb") as f:
+        f.write(_pdf_document(contents))
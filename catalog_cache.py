@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+FORMAT_VERSION = 2
+CACHE_DIRNAME = ".catalog_cache"
+HASH_CHUNK = 1 << 20
+
+# String columns with at most this share of distinct values are stored as
+# integer codes + vocabulary instead of a full string table.
+CATEGORICAL_RATIO = 0.5
+
+
+def narrow_int_dtype(lo, hi):
+    """Smallest signed integer dtype holding every value in [lo, hi]"""
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return np.int64
+
+
+def narrow_numeric(values):
+    """
+    values in the smallest dtype that converts back to float64 exactly:
+    the narrowest integer type for integer columns, float32 for floats that
+    survive the round trip, the original array otherwise.
+    """
+    if len(values) == 0:
+        return values
+    if np.issubdtype(values.dtype, np.integer):
+        return values.astype(narrow_int_dtype(values.min(), values.max()))
+    if values.dtype == np.float64:
+        narrowed = values.astype(np.float32)
+        if np.array_equal(narrowed.astype(np.float64), values, equal_nan=True):
+            return narrowed
+    return values
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StringTable:
+    """
+    Memory-mapped UTF-8 string column: one offsets array and one byte blob.
+    Strings are decoded only for the rows that are asked for.
+    """
+
+    def __init__(self, offsets, data, nulls=None):
+        self.offsets = offsets
+        self.data = data
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, i):
+        if self.nulls is not None and self.nulls[i]:
+            return np.nan
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def take(self, idx):
+        return [self.get(i) for i in np.asarray(idx).tolist()]
+
+    @staticmethod
+    def write(values, prefix):
+        """Write a list of str/NaN values as <prefix>.offsets.npy + <prefix>.data.bin"""
+        nulls = np.array([not isinstance(v, str) for v in values], dtype=bool)
+        encoded = [v.encode("utf-8") if isinstance(v, str) else b"" for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        np.save(prefix + ".offsets.npy", offsets)
+        with open(prefix + ".data.bin", "wb") as f:
+            f.write(b"".join(encoded))
+        if nulls.any():
+            np.save(prefix + ".nulls.npy", nulls)
+            return True
+        return False
+
+
+class CompiledCatalog:
+    """
+    Columnar, memory-mapped copy of the SKU catalog CSV.
+    Numeric columns are .npy arrays opened with mmap_mode="r" (zero-copy),
+    stored in the narrowest lossless dtype (e.g. float32 conductor sizes,
+    int16 temperatures); low-cardinality strings are int8/int16 codes +
+    vocabulary and the rest live in a StringTable. Implements the column
+    interface used by SkuMatrix.
+    """
+
+    def __init__(self, build_dir, manifest):
+        self.build_dir = build_dir
+        self.manifest = manifest
+        self.columns = [c["name"] for c in manifest["columns"]]
+        self.kinds = {c["name"]: c for c in manifest["columns"]}
+        self.rows = manifest["rows"]
+        self._arrays = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _path(self, name):
+        return os.path.join(self.build_dir, name)
+
+    def array(self, col):
+        """Raw column storage: ndarray (numeric/codes) or StringTable"""
+        if col not in self._arrays:
+            meta = self.kinds[col]
+            if meta["kind"] == "string":
+                data_path = self._path(meta["file"] + ".data.bin")
+                data = (np.memmap(data_path, dtype=np.uint8, mode="r")
+                        if os.path.getsize(data_path) else np.empty(0, dtype=np.uint8))
+                nulls = (np.load(self._path(meta["file"] + ".nulls.npy"), mmap_mode="r")
+                         if meta.get("nulls") else None)
+                offsets = np.load(self._path(meta["file"] + ".offsets.npy"), mmap_mode="r")
+                self._arrays[col] = StringTable(offsets, data, nulls)
+            else:
+                self._arrays[col] = np.load(self._path(meta["file"] + ".npy"), mmap_mode="r")
+        return self._arrays[col]
+
+    def numeric(self, col):
+        """
+        Return a numeric column in its stored dtype (every value converts
+        to float64 exactly), or None if it isn't numeric
+        """
+        if self.kinds[col]["kind"] != "numeric":
+            return None
+        return self.array(col)
+
+    def lowered_codes(self, col):
+        """Return (codes, uniques) of the lower-cased string form of a column"""
+        meta = self.kinds[col]
+        if meta["kind"] == "categorical":
+            vocab = [str(v).lower() for v in meta["vocab"]] + ["nan"]
+            uniques = list(dict.fromkeys(vocab))
+            remap = np.array([uniques.index(v) for v in vocab], dtype=narrow_int_dtype(-1, len(uniques)))
+            return remap[self.array(col)], uniques
+        import pandas as pd
+        values = self.take(np.arange(self.rows), col)
+        codes, uniques = pd.factorize(pd.Series([str(v).lower() for v in values], dtype=object))
+        return codes.astype(narrow_int_dtype(-1, len(uniques))), list(uniques)
+
+    def take(self, sku_idx, col):
+        """Return catalog values of a column for the given SKU positions"""
+        meta = self.kinds[col]
+        values = self.array(col)
+        if meta["kind"] == "string":
+            return values.take(sku_idx)
+        if meta["kind"] == "categorical":
+            vocab = meta["vocab"] + [np.nan]
+            return [vocab[c] for c in values[sku_idx].tolist()]
+        return values[sku_idx].tolist()
+
+    def to_frame(self):
+        """Materialize the whole catalog as a DataFrame (same shape as pd.read_csv)"""
+        import pandas as pd
+        data = {}
+        for col in self.columns:
+            meta = self.kinds[col]
+            if meta["kind"] == "numeric":
+                data[col] = self.array(col).astype(meta["dtype"])
+            else:
+                data[col] = pd.Series(self.take(np.arange(self.rows), col))
+        return pd.DataFrame(data, columns=self.columns)
+
+
+def compile_catalog(csv_path, build_dir):
+    """Parse the CSV once and write every column to build_dir"""
+    import pandas as pd
+    df = pd.read_csv(csv_path)
+    os.makedirs(build_dir, exist_ok=True)
+    columns = []
+    for i, col in enumerate(df.columns):
+        name = f"col{i}"
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series):
+            np.save(os.path.join(build_dir, name + ".npy"), narrow_numeric(series.to_numpy()))
+            columns.append({"name": col, "kind": "numeric", "file": name, "dtype": str(series.dtype)})
+            continue
+        codes, uniques = pd.factorize(series)
+        if len(uniques) <= CATEGORICAL_RATIO * max(len(series), 1):
+            # NaN is factorized to -1, which indexes the trailing NaN slot of vocab
+            np.save(os.path.join(build_dir, name + ".npy"), codes.astype(narrow_int_dtype(-1, len(uniques))))
+            columns.append({"name": col, "kind": "categorical", "file": name,
+                            "vocab": [str(u) for u in uniques]})
+        else:
+            nulls = StringTable.write(series.tolist(), os.path.join(build_dir, name))
+            columns.append({"name": col, "kind": "string", "file": name, "nulls": nulls})
+    return {"rows": len(df), "columns": columns}
+
+
+class CatalogCache:
+    """
+    Keeps a compiled copy of a SKU CSV under cache_dir (default: a
+    .catalog_cache folder next to the CSV) and reopens it as
+    long as the CSV's size, mtime and content hash are unchanged.
+    A touched-but-identical file is re-validated by hash, not rebuilt.
+    """
+
+    def __init__(self, csv_path, cache_dir=None):
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(csv_path)), CACHE_DIRNAME)
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        self.pointer_path = os.path.join(self.cache_dir, stem + ".json")
+        self.stem = stem
+
+    def _read_pointer(self):
+        try:
+            with open(self.pointer_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("format") != FORMAT_VERSION:
+            return None
+        if not os.path.isdir(os.path.join(self.cache_dir, manifest["build"])):
+            return None
+        return manifest
+
+    def _write_pointer(self, manifest):
+        tmp_path = self.pointer_path + f".{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.pointer_path)
+
+    def open(self, verify_hash=False):
+        """Return a CompiledCatalog for the CSV, compiling it if it is stale"""
+        stat = os.stat(self.csv_path)
+        manifest = self._read_pointer()
+        if manifest is not None:
+            same_stat = (manifest["size"] == stat.st_size and manifest["mtime_ns"] == stat.st_mtime_ns)
+            if same_stat and not verify_hash:
+                return CompiledCatalog(os.path.join(self.cache_dir, manifest["build"]), manifest)
+            digest = file_digest(self.csv_path)
+            if digest == manifest["sha256"]:
+                manifest.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                self._write_pointer(manifest)
+                return CompiledCatalog(os.path.join(self.cache_dir, manifest["build"]), manifest)
+        else:
+            digest = file_digest(self.csv_path)
+        return self.rebuild(stat, digest, previous=manifest)
+
+    def rebuild(self, stat, digest, previous=None):
+        """Compile a fresh build directory and switch the pointer to it atomically"""
+        build = f"{self.stem}-{digest[:16]}"
+        build_dir = os.path.join(self.cache_dir, build)
+        tmp_dir = build_dir + f".{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        layout = compile_catalog(self.csv_path, tmp_dir)
+        shutil.rmtree(build_dir, ignore_errors=True)
+        os.replace(tmp_dir, build_dir)
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "source": os.path.abspath(self.csv_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "build": build,
+            **layout,
+        }
+        self._write_pointer(manifest)
+        if previous is not None and previous["build"] != build:
+            shutil.rmtree(os.path.join(self.cache_dir, previous["build"]), ignore_errors=True)
+        print(f"Compiled SKU catalog cache: {build_dir}")
+        return CompiledCatalog(build_dir, manifest)
@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from matching_engine import OUTPUT_COLUMNS, SkuMatrix, match_items
+from pricing_agent import PricingAgent
+from report_generator import render_reports
+from technical_agent import TechnicalAgent
+
+# Above this share of changed SKUs a full re-match is cheaper than patching
+FULL_REMATCH_RATIO = 0.25
+TEXT_COLUMNS = {"item_id": str, "item_description": str, "sku": str, "product_name": str}
+
+
+class CatalogDiff:
+    """
+    Row-level difference between two versions of the SKU catalog, keyed by sku:
+    added, removed, price_changed (only unit_price differs) and modified
+    (any other column differs).
+    """
+
+    def __init__(self, old_df: pd.DataFrame, new_df: pd.DataFrame, key="sku"):
+        self.key = key
+        self.new_df = new_df
+        self.unique = old_df[key].is_unique and new_df[key].is_unique
+        old = old_df.set_index(key, drop=False) if self.unique else old_df
+        new = new_df.set_index(key, drop=False) if self.unique else new_df
+
+        old_keys, new_keys = pd.Index(old_df[key]), pd.Index(new_df[key])
+        self.added = new_keys.difference(old_keys, sort=False).tolist()
+        self.removed = old_keys.difference(new_keys, sort=False).tolist()
+        self.price_changed, self.modified = [], []
+        self.reordered = False
+
+        if self.unique:
+            common = new_keys.intersection(old_keys, sort=False)
+            columns = [c for c in new_df.columns if c in old_df.columns and c != "unit_price"]
+            a, b = old.loc[common, columns], new.loc[common, columns]
+            differs = ~((a == b) | (a.isna() & b.isna())).all(axis=1)
+            price_differs = old.loc[common, "unit_price"].to_numpy() != new.loc[common, "unit_price"].to_numpy()
+            self.modified = common[differs.to_numpy()].tolist()
+            self.price_changed = common[~differs.to_numpy() & price_differs].tolist()
+
+            # Unchanged SKUs must keep their relative order, since catalog
+            # order is the last tie-break of the ranking
+            old_pos = pd.Series(np.arange(len(old_df)), index=old_keys)
+            self.reordered = not old_pos[common].is_monotonic_increasing
+
+        self.positions = dict(zip(new_keys, range(len(new_df)))) if self.unique else None
+        self.prices = dict(zip(new_keys, new_df["unit_price"].tolist())) if self.unique else None
+        self._changed_matrix = None
+
+    @property
+    def changed(self):
+        """SKUs of the new catalog that need scoring"""
+        return self.added + self.modified + self.price_changed
+
+    @property
+    def empty(self):
+        return not (self.added or self.removed or self.modified or self.price_changed)
+
+    def changed_matrix(self):
+        """SkuMatrix over the changed SKUs only, in new catalog order"""
+        if self._changed_matrix is None:
+            changed_pos = sorted(self.positions[sku] for sku in self.changed)
+            self._changed_matrix = SkuMatrix(self.new_df.iloc[changed_pos].reset_index(drop=True))
+        return self._changed_matrix
+
+    def requires_full_rematch(self):
+        return (not self.unique or self.reordered
+                or len(self.changed) > FULL_REMATCH_RATIO * max(len(self.new_df), 1))
+
+    def summary(self):
+        return {"added": len(self.added), "removed": len(self.removed),
+                "price_changed": len(self.price_changed), "modified": len(self.modified)}
+
+
+def rematch_incremental(tech: TechnicalAgent, diff: CatalogDiff, items: list, stored_df: pd.DataFrame, top_k=3):
+    """
+    Patch stored top-k matches for a new catalog version.
+    Items whose stored SKUs were removed, modified or got more expensive are
+    fully re-matched (an unstored SKU may now rank higher); for all others the
+    new top-k is the best of their stored rows plus the changed SKUs scored on
+    their own. Returns (matches DataFrame, affected item ids).
+    """
+    item_ids = [item["item_id"] for item in items]
+    if diff.requires_full_rematch() or len(set(item_ids)) != len(item_ids):
+        return tech.match_rfp_items(items, top_k=top_k), set(item_ids)
+    if diff.empty:
+        return stored_df, set()
+
+    skus = stored_df["sku"].tolist()
+    old_prices = stored_df["unit_price"].to_numpy()
+    new_prices = np.array([diff.prices.get(sku, np.nan) for sku in skus], dtype=np.float64)
+    gone = set(diff.removed) | set(diff.modified)
+    worse = np.array([sku in gone for sku in skus], dtype=bool) | (new_prices > old_prices)
+    dirty_ids = set(stored_df["item_id"].to_numpy()[worse].tolist())
+    clean_items = [item for item in items if item["item_id"] not in dirty_ids]
+    dirty_items = [item for item in items if item["item_id"] in dirty_ids]
+
+    stored = stored_df[~stored_df["item_id"].isin(dirty_ids)] if dirty_ids else stored_df
+    repriced = np.isin(stored["sku"].to_numpy(), diff.price_changed)
+    if repriced.any():
+        stored = stored.copy()
+        # New prices may be fractional where the stored ones were all integers
+        stored["unit_price"] = stored["unit_price"].astype(np.float64)
+        stored.loc[repriced, "unit_price"] = [diff.prices[sku] for sku in stored.loc[repriced, "sku"]]
+    parts = [stored]
+    if clean_items and diff.changed:
+        parts.append(match_items(clean_items, diff.changed_matrix(), top_k=top_k))
+    if dirty_items:
+        parts.append(tech.match_rfp_items(dirty_items, top_k=top_k))
+
+    # Rank every candidate by (item, score desc, unit_price asc, catalog order),
+    # drop the duplicate of a re-priced stored row and keep the first top_k per item
+    combined = pd.concat([p for p in parts if len(p)] or [stored], ignore_index=True)
+    order = {item_id: i for i, item_id in enumerate(item_ids)}
+    item = np.array([order[i] for i in combined["item_id"].tolist()], dtype=np.int64)
+    pos = np.array([diff.positions[sku] for sku in combined["sku"].tolist()], dtype=np.int64)
+    rows = np.lexsort((pos, combined["unit_price"].to_numpy(), -combined["match_score"].to_numpy(), item))
+    item, pos = item[rows], pos[rows]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (item[1:] != item[:-1]) | (pos[1:] != pos[:-1])
+    rows, item = rows[first], item[first]
+    starts = np.flatnonzero(np.r_[True, item[1:] != item[:-1]])
+    rank = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+    result = combined.iloc[rows[rank < top_k]][OUTPUT_COLUMNS].reset_index(drop=True)
+    # Keep the stored column types, except unit_price: casting it back would truncate new fractional prices
+    dtypes = stored_df.dtypes[OUTPUT_COLUMNS].drop("unit_price")
+    if not result.dtypes.drop("unit_price").equals(dtypes):
+        result = result.astype(dtypes.to_dict())
+    return result, changed_items(stored_df, result)
+
+
+def changed_items(before_df, after_df):
+    """Item ids whose ranked match rows differ between two match frames (both in item order)"""
+    same_layout = (len(before_df) == len(after_df)
+                   and (before_df["item_id"].to_numpy() == after_df["item_id"].to_numpy()).all())
+    if not same_layout:
+        return set(before_df["item_id"]) | set(after_df["item_id"])
+    differs = np.zeros(len(after_df), dtype=bool)
+    for col in ("sku", "product_name", "match_score", "unit_price"):
+        old, new = before_df[col].to_numpy(), after_df[col].to_numpy()
+        differs |= ~((old == new) | (pd.isna(old) & pd.isna(new)))
+    return set(after_df["item_id"].to_numpy()[differs].tolist())
+
+
+def reprice_incremental(matches_df, old_final_df, affected_items, quantity_per_item=100):
+    """Recompute pricing rows only for affected items and splice them into old_final_df"""
+    if not affected_items:
+        return old_final_df
+    pricing = PricingAgent(matches_df[matches_df["item_id"].isin(affected_items)])
+    top_df = pricing.select_top_matches()
+    fresh = pricing.calculate_costs(top_df, quantity_per_item=quantity_per_item)
+    kept = old_final_df[~old_final_df["item_id"].isin(affected_items)]
+    final_df = pd.concat([kept, fresh], ignore_index=True)
+    return final_df.sort_values("item_id", kind="stable").reset_index(drop=True)
+
+
+def update_batch_outputs(old_csv, new_csv, batch_dir, top_k=3, quantity_per_item=100, workers=None):
+    """
+    Patch every per-RFP output folder of a batch run (see batch_runner) for
+    a new catalog version. All RFPs are re-matched and re-priced together
+    (item ids are prefixed with their folder name); the CSVs and report of
+    affected RFPs are rewritten, reports rendered in parallel processes.
+    """
+    start = time.perf_counter()
+    diff = CatalogDiff(pd.read_csv(old_csv), pd.read_csv(new_csv))
+    print(f"Catalog diff: {diff.summary()}")
+    tech = TechnicalAgent(new_csv)
+    tech.load_sku_data()
+
+    folders, items, stored, finals, titles = [], [], [], [], {}
+    for name in sorted(os.listdir(batch_dir)):
+        folder = os.path.join(batch_dir, name)
+        paths = [os.path.join(folder, f) for f in ("rfp_data.json", "technical_matches.csv", "final_pricing_summary.csv")]
+        if not all(os.path.exists(p) for p in paths):
+            continue
+        with open(paths[0]) as f:
+            rfp_data = json.load(f)
+        items += [dict(item, item_id=f"{name}/{item['item_id']}") for item in rfp_data["items"]]
+        titles[name] = rfp_data.get("title", "RFP")
+        for frame, path in ((stored, paths[1]), (finals, paths[2])):
+            df = pd.read_csv(path, dtype=TEXT_COLUMNS)
+            df["item_id"] = name + "/" + df["item_id"]
+            frame.append(df)
+        folders.append(name)
+    if not folders:
+        print(f"No batch outputs found in {batch_dir}")
+        return 0
+
+    matches_df, affected = rematch_incremental(tech, diff, items, pd.concat(stored, ignore_index=True), top_k=top_k)
+    final_df = reprice_incremental(matches_df, pd.concat(finals, ignore_index=True), affected, quantity_per_item)
+
+    updated = {item_id.split("/", 1)[0] for item_id in affected}
+    reports = []
+    for df, filename in ((matches_df, "technical_matches.csv"), (final_df, "final_pricing_summary.csv")):
+        keys = df["item_id"].str.split("/", n=1, expand=True)
+        df = df.assign(item_id=keys[1])
+        for name, part in df.groupby(keys[0], sort=False):
+            if name in updated:
+                part.to_csv(os.path.join(batch_dir, name, filename), index=False)
+                if filename == "final_pricing_summary.csv":
+                    reports.append((titles[name], part.reset_index(drop=True),
+                                    os.path.join(batch_dir, name, "RFP_Report.pptx")))
+    render_reports(reports, workers=workers)
+
+    print(f"Re-priced {len(updated)}/{len(folders)} RFPs ({len(affected)} items affected) "
+          f"in {time.perf_counter() - start:.2f}s")
+    return len(updated)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Patch stored RFP results for a new SKU catalog")
+    parser.add_argument("old_csv", help="previous SKU catalog")
+    parser.add_argument("new_csv", help="updated SKU catalog")
+    parser.add_argument("batch_dir", help="output root of a batch run")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--quantity", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="report worker processes (default: CPU count)")
+    args = parser.parse_args()
+    update_batch_outputs(args.old_csv, args.new_csv, args.batch_dir, args.top_k, args.quantity, args.workers)
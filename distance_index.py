@@ -0,0 +1,246 @@
+import heapq
+import math
+import numpy as np
+from matching_engine import SPEC_COLUMNS, ItemBatch, MatchResult, SkuMatrix
+
+# One distance unit per 10% relative difference (the tolerance of spec_match_score)
+DISTANCE_UNIT = math.log(1.1)
+# Coordinate of a missing / non-positive catalog value: farther than any real spec
+MISSING_COORDINATE = 1e6
+LEAF_SIZE = 32
+INSULATION = "insulation"
+
+
+def spec_coordinates(values):
+    """Log-scale coordinates in tolerance units (NaN for missing or non-positive values)"""
+    values = np.asarray(values, dtype=np.float64)
+    coords = np.full(values.shape, np.nan)
+    positive = values > 0
+    coords[positive] = np.log(values[positive]) / DISTANCE_UNIT
+    return coords
+
+
+def squared_distances(points, query, penalty=0.0):
+    """Squared distance of every point to the query, plus a squared categorical penalty"""
+    return ((points - query) ** 2).sum(axis=1) + penalty * penalty
+
+
+def distance_score(squared):
+    """Similarity percentage: 100 for an exact match, 50 one tolerance unit away"""
+    return np.round(100.0 / (1.0 + np.sqrt(squared)), 2)
+
+
+class KDTree:
+    """
+    KD-tree over a small set of points (bucketed leaves, bounding boxes
+    per node). query() returns the k nearest points best-first.
+    """
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        self.points = points
+        n, dims = points.shape
+        self.perm = np.arange(n)
+        self.starts, self.stops, self.children = [], [], []
+        self.mins, self.maxs = [], []
+        stack = [(0, n, self._new_node(0, n))]
+        while stack:
+            start, stop, node = stack.pop()
+            if stop - start <= leaf_size:
+                continue
+            idx = self.perm[start:stop]
+            spread = self.maxs[node] - self.mins[node]
+            dim = int(np.argmax(spread))
+            if spread[dim] == 0:
+                continue
+            mid = (stop - start) // 2
+            self.perm[start:stop] = idx[np.argpartition(points[idx, dim], mid)]
+            left = self._new_node(start, start + mid)
+            right = self._new_node(start + mid, stop)
+            self.children[node] = (left, right)
+            stack += [(start, start + mid, left), (start + mid, stop, right)]
+        self.mins = np.array(self.mins).reshape(-1, dims)
+        self.maxs = np.array(self.maxs).reshape(-1, dims)
+
+    def _new_node(self, start, stop):
+        block = self.points[self.perm[start:stop]]
+        self.starts.append(start)
+        self.stops.append(stop)
+        self.children.append(None)
+        self.mins.append(block.min(axis=0))
+        self.maxs.append(block.max(axis=0))
+        return len(self.starts) - 1
+
+    def _box_distance(self, node, query):
+        gap = np.maximum(self.mins[node] - query, 0) + np.maximum(query - self.maxs[node], 0)
+        return float((gap * gap).sum())
+
+    def query(self, query, k):
+        """(squared distances, point indices) of the k nearest points, nearest first"""
+        best = []  # max-heap of (-squared distance, point)
+        queue = [(self._box_distance(0, query), 0)]
+        while queue:
+            bound, node = heapq.heappop(queue)
+            if len(best) == k and bound > -best[0][0]:
+                break
+            children = self.children[node]
+            if children is None:
+                idx = self.perm[self.starts[node]:self.stops[node]]
+                for sq, i in zip(squared_distances(self.points[idx], query).tolist(), idx.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-sq, i))
+                    elif sq < -best[0][0]:
+                        heapq.heapreplace(best, (-sq, i))
+                continue
+            for child in children:
+                heapq.heappush(queue, (self._box_distance(child, query), child))
+        best.sort(key=lambda entry: -entry[0])
+        return np.array([-sq for sq, _ in best]), np.array([i for _, i in best], dtype=np.int64)
+
+
+class SpecGroup:
+    """
+    SKUs of one insulation value: their distinct spec points (in a KDTree)
+    and, per point, its SKU positions in (unit_price, catalog order).
+    """
+
+    def __init__(self, coords, positions, price_rank):
+        points, inverse = np.unique(coords, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.lexsort((price_rank[positions], inverse))
+        self.points = points
+        self.skus = positions[order]
+        self.starts = np.zeros(len(points) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(inverse, minlength=len(points)), out=self.starts[1:])
+        self.tree = KDTree(points)
+
+    def nearest(self, query, top_k, penalty):
+        """
+        (squared distances, SKU positions) holding this group's top_k SKUs
+        and every SKU tied with the last of them (at most top_k per point)
+        """
+        present = ~np.isnan(query)
+        if not present.all():
+            # The item leaves some numeric spec open: scan the points on the given ones
+            sq = squared_distances(self.points[:, present], query[present])
+            points = np.argsort(sq, kind="stable")
+            sq = sq[points]
+        else:
+            k = top_k
+            while True:
+                sq, points = self.tree.query(query, min(k, len(self.points)))
+                enough = np.searchsorted(np.cumsum(self.starts[points + 1] - self.starts[points]), top_k)
+                # Points the query didn't return are at least sq[-1] away
+                if len(sq) == len(self.points) or (enough < len(sq) and sq[enough] < sq[-1]):
+                    break
+                k *= 2
+        enough = np.searchsorted(np.cumsum(self.starts[points + 1] - self.starts[points]), top_k)
+        if enough < len(sq):
+            keep = sq <= sq[enough]
+            sq, points = sq[keep], points[keep]
+        starts = self.starts[points]
+        counts = np.minimum(self.starts[points + 1] - starts, top_k)
+        skus = np.concatenate([self.skus[s:s + c] for s, c in zip(starts.tolist(), counts.tolist())])
+        return np.repeat(sq + penalty * penalty, counts), skus
+
+
+class DistanceIndex:
+    """
+    Continuous "closest SKU" scoring. Numeric specs become log-scale
+    coordinates in tolerance units (one unit = 10% apart), so the distance
+    between an item and a SKU is how many tolerances they differ by.
+    SKUs are grouped by insulation, each group's distinct spec points held
+    in a KD-tree built once per catalog; an item is a k-nearest query.
+    insulation_weight=None keeps only SKUs with the item's insulation,
+    a number adds that many units of distance for a different insulation.
+    """
+
+    def __init__(self, matrix: SkuMatrix):
+        self.matrix = matrix
+        self.columns = [col for col in SPEC_COLUMNS if col in matrix.numeric]
+        coords = np.empty((matrix.size, len(self.columns)))
+        for j, col in enumerate(self.columns):
+            coords[:, j] = spec_coordinates(matrix.numeric[col])
+        self.coords = np.where(np.isnan(coords), MISSING_COORDINATE, coords)
+
+        if INSULATION in matrix.numeric or INSULATION not in SPEC_COLUMNS:
+            codes = np.zeros(matrix.size, dtype=np.int64)
+        else:
+            codes = matrix.string_codes(INSULATION)[0].astype(np.int64)
+        self.groups = {}
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.r_[True, codes[order][1:] != codes[order][:-1], True])
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            positions = order[start:stop]
+            self.groups[int(codes[positions[0]])] = SpecGroup(self.coords[positions], positions, matrix.price_rank)
+
+    def item_queries(self, batch: ItemBatch):
+        """(items x columns) query coordinates and the insulation code of every item"""
+        queries = np.full((len(batch), len(self.columns)), np.nan)
+        for j, col in enumerate(self.columns):
+            if col in batch.numeric:
+                queries[:, j] = spec_coordinates(batch.numeric[col])
+        codes = batch.strings.get(INSULATION)
+        if codes is None:
+            codes = np.full(len(batch), -1, dtype=np.int32)
+        return queries, codes
+
+    def group_penalties(self, code, insulation_weight):
+        """(group, penalty) pairs searched for an item with this insulation code"""
+        if code == -1:
+            return [(group, 0.0) for group in self.groups.values()]
+        if insulation_weight is None:
+            return [(self.groups[code], 0.0)] if code in self.groups else []
+        return [(group, 0.0 if g == code else float(insulation_weight)) for g, group in self.groups.items()]
+
+    def match_items(self, items, top_k=3, insulation_weight=None, as_frame=True):
+        """Top-k closest SKUs per item, ranked by (distance, unit_price, catalog order)"""
+        if not len(items) or self.matrix.size == 0 or top_k <= 0:
+            return MatchResult.empty(items, self.matrix).finish(as_frame)
+        batch = ItemBatch(items, self.matrix)
+        queries, codes = self.item_queries(batch)
+
+        item_pos, sku_pos, squared = [], [], []
+        for i in range(len(batch)):
+            parts = [group.nearest(queries[i], top_k, penalty)
+                     for group, penalty in self.group_penalties(int(codes[i]), insulation_weight)]
+            if not parts:
+                continue
+            sq = np.concatenate([p[0] for p in parts])
+            skus = np.concatenate([p[1] for p in parts])
+            top = np.lexsort((self.matrix.price_rank[skus], sq))[:top_k]
+            item_pos.append(np.full(len(top), i, dtype=np.int32))
+            sku_pos.append(skus[top].astype(self.matrix.price_rank.dtype))
+            squared.append(sq[top])
+        if not item_pos:
+            return MatchResult.empty(items, self.matrix).finish(as_frame)
+        return MatchResult(items, self.matrix, np.concatenate(item_pos), np.concatenate(sku_pos),
+                           distance_score(np.concatenate(squared))).finish(as_frame)
+
+    def match_items_brute_force(self, items, top_k=3, insulation_weight=None, as_frame=True):
+        """Same ranking as match_items by scanning every SKU (reference for verify)"""
+        if not len(items) or self.matrix.size == 0 or top_k <= 0:
+            return MatchResult.empty(items, self.matrix).finish(as_frame)
+        batch = ItemBatch(items, self.matrix)
+        queries, codes = self.item_queries(batch)
+        sku_codes = np.full(self.matrix.size, -1, dtype=np.int64)
+        for g, group in self.groups.items():
+            sku_codes[group.skus] = g
+
+        item_pos, sku_pos, squared = [], [], []
+        for i in range(len(batch)):
+            query, code = queries[i], int(codes[i])
+            present = ~np.isnan(query)
+            sq = squared_distances(self.coords[:, present], query[present])
+            if code != -1:
+                other = sku_codes != code
+                if insulation_weight is None:
+                    sq[other] = np.inf
+                else:
+                    sq[other] += float(insulation_weight) ** 2
+            allowed = np.flatnonzero(np.isfinite(sq))
+            top = allowed[np.lexsort((self.matrix.price_rank[allowed], sq[allowed]))][:top_k]
+            item_pos.append(np.full(len(top), i, dtype=np.int32))
+            sku_pos.append(top.astype(self.matrix.price_rank.dtype))
+            squared.append(sq[top])
+        return MatchResult(items, self.matrix, np.concatenate(item_pos), np.concatenate(sku_pos),
+                           distance_score(np.concatenate(squared))).finish(as_frame)
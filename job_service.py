@@ -0,0 +1,330 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import batch_runner
+from catalog_cache import CatalogCache
+from sales_agent import SalesAgent
+from pricing_agent import PricingAgent
+from report_generator import ReportGenerator
+from rfp_items import json_default
+from tracing import Tracer, span
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE_SIZE = 32
+# Finished jobs kept for fetching before the oldest are dropped
+MAX_FINISHED_JOBS = 200
+STAGES = batch_runner.STAGES
+
+
+# ---- Stage functions (run in the process pool) ----
+
+def stage_sales(rfp_name, rfp_bytes):
+    sales = SalesAgent(rfp_name, rfp_bytes=rfp_bytes, ocr_workers=1)
+    sales.load_rfp()
+    return sales.rfp_data
+
+
+def stage_technical(items, top_k):
+    return batch_runner.worker_tech().match_rfp_items(items, top_k=top_k)
+
+
+def stage_pricing(matches_df, quantity):
+    pricing = PricingAgent(matches_df)
+    pricing.load_matches()
+    top_df = pricing.select_top_matches()
+    return pricing.calculate_costs(top_df, quantity_per_item=quantity)
+
+
+def stage_report(title, final_df):
+    return ReportGenerator(title, final_df).build().to_bytes()
+
+
+def run_traced(name, fn, *args):
+    """Run a stage function under a Tracer in the worker; returns (value, span rows)"""
+    with Tracer() as tracer:
+        with span(name):
+            value = fn(*args)
+    return value, tracer.breakdown()
+
+
+class Job:
+    def __init__(self, rfp_name, rfp_bytes, top_k, quantity):
+        self.id = uuid.uuid4().hex
+        self.rfp_name = rfp_name
+        self.rfp_bytes = rfp_bytes
+        self.top_k = top_k
+        self.quantity = quantity
+        self.state = "queued"
+        self.stage = None
+        self.error = None
+        self.result = None
+        self.report = None
+        self.timings = {}
+        self.trace = []
+        self.submitted = time.time()
+        self.finished = None
+
+    def status(self):
+        done_stages = len(self.timings)
+        return {
+            "job_id": self.id,
+            "rfp_name": self.rfp_name,
+            "state": self.state,
+            "stage": self.stage,
+            "progress": round(done_stages / len(STAGES), 2) if self.state != "done" else 1.0,
+            "timings": {k: round(v, 4) for k, v in self.timings.items()},
+            "error": self.error,
+        }
+
+
+class JobService:
+    """
+    Local RFP job service: a bounded queue of jobs run stage by stage
+    (Sales → Technical → Pricing → Report) on a process pool whose
+    workers each hold the SKU catalog. Jobs can be cancelled between
+    stages; a stage that is already running finishes and is discarded.
+    """
+
+    def __init__(self, sku_path="data/mock_skus.csv", workers=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.sku_path = sku_path
+        self.workers = workers or os.cpu_count() or 1
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self.pool = None
+        self.dispatchers = []
+
+    async def start(self):
+        CatalogCache(self.sku_path).open()
+        self.pool = self._new_pool()
+        self.dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=batch_runner.init_worker,
+                                   initargs=(self.sku_path,))
+
+    async def stop(self):
+        for task in self.dispatchers:
+            task.cancel()
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, rfp_name, rfp_bytes, top_k=3, quantity=100):
+        """Queue a job; raises asyncio.QueueFull when the queue is at capacity"""
+        job = Job(rfp_name, rfp_bytes, top_k, quantity)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self._prune()
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs[job_id]
+        if job.state in ("queued", "running"):
+            job.state = "cancelled"
+            job.finished = time.time()
+        return job
+
+    def _prune(self):
+        finished = sorted((j for j in self.jobs.values() if j.finished), key=lambda j: j.finished)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+    async def _stage(self, job, name, fn, *args):
+        if job.state == "cancelled":
+            raise asyncio.CancelledError
+        job.stage = name
+        start = time.perf_counter()
+        pool = self.pool
+        try:
+            value, spans = await asyncio.get_running_loop().run_in_executor(pool, run_traced, name, fn, *args)
+        except BrokenProcessPool:
+            # A worker died: the jobs in flight on this pool fail, later ones get a fresh pool
+            if self.pool is pool:
+                print("⚠️ A job worker process died; restarting the pool")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = self._new_pool()
+            raise
+        job.timings[name] = time.perf_counter() - start
+        job.trace.extend(spans)
+        return value
+
+    async def _dispatch(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.state == "cancelled":
+                    continue
+                job.state = "running"
+                rfp_data = await self._stage(job, "sales", stage_sales, job.rfp_name, job.rfp_bytes)
+                job.rfp_bytes = None
+                items = (rfp_data or {}).get("items") or []
+                if not items:
+                    raise ValueError("no items parsed from RFP")
+                matches_df = await self._stage(job, "technical", stage_technical, items, job.top_k)
+                final_df = await self._stage(job, "pricing", stage_pricing, matches_df, job.quantity)
+                report = await self._stage(job, "report", stage_report, rfp_data.get("title", "RFP"), final_df)
+                if job.state == "cancelled":
+                    continue
+                job.result = {
+                    "rfp_data": rfp_data,
+                    "items": len(items),
+                    "matches_csv": matches_df.to_csv(index=False),
+                    "pricing_csv": final_df.to_csv(index=False),
+                    "trace": job.trace,
+                }
+                job.report = report
+                job.state = "done"
+                job.stage = None
+            except asyncio.CancelledError:
+                if job.state != "cancelled":
+                    raise
+            except Exception as e:
+                job.state = "failed"
+                job.error = f"{type(e).__name__}: {e}"
+            finally:
+                job.finished = job.finished or time.time()
+                self.queue.task_done()
+
+    # ---- HTTP ----
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                request_line = (await reader.readline()).decode("latin-1").split()
+                if len(request_line) < 2:
+                    return
+                method, target = request_line[0], request_line[1]
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode("latin-1").strip()
+                    if not line:
+                        break
+                    key, _, value = line.partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload, content_type = self.route(method, target, body)
+            except Exception as e:
+                status, payload, content_type = 500, {"error": str(e)}, None
+
+            if content_type is None:
+                payload = json.dumps(payload, default=json_default).encode("utf-8")
+                content_type = "application/json"
+            reason = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+                      409: "Conflict", 503: "Service Unavailable"}.get(status, "Error")
+            writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+            writer.write(payload)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def route(self, method, target, body):
+        """Return (HTTP status, payload, content type or None for JSON)"""
+        url = urllib.parse.urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = dict(urllib.parse.parse_qsl(url.query))
+
+        if method == "GET" and parts == ["health"]:
+            states = {}
+            for job in self.jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return 200, {"workers": self.workers, "queued": self.queue.qsize(),
+                         "queue_size": self.queue.maxsize, "jobs": states}, None
+
+        if method == "POST" and parts == ["jobs"]:
+            if not body or "name" not in query:
+                return 400, {"error": "POST the RFP file as the body with ?name=<file name>"}, None
+            try:
+                job = self.submit(query["name"], body, int(query.get("top_k", 3)), int(query.get("quantity", 100)))
+            except asyncio.QueueFull:
+                return 503, {"error": "job queue is full, retry later"}, None
+            return 202, job.status(), None
+
+        if len(parts) < 2 or parts[0] != "jobs" or parts[1] not in self.jobs:
+            return 404, {"error": "unknown job or endpoint"}, None
+        job = self.jobs[parts[1]]
+
+        if method == "GET" and len(parts) == 2:
+            return 200, job.status(), None
+        if method == "DELETE" and len(parts) == 2:
+            return 200, self.cancel(job.id).status(), None
+        if method == "GET" and parts[2:] == ["result"]:
+            if job.state != "done":
+                return 409, job.status(), None
+            return 200, {**job.status(), **job.result}, None
+        if method == "GET" and parts[2:] == ["report"]:
+            if job.state != "done":
+                return 409, job.status(), None
+            return 200, job.report, "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+        return 404, {"error": "unknown endpoint"}, None
+
+
+class JobClient:
+    """Small blocking client for the job service (used by app.py)"""
+
+    def __init__(self, base_url=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None, raw=False):
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read()
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{e.code}: {e.read().decode('utf-8', 'replace')}") from e
+        return data if raw else json.loads(data)
+
+    def available(self):
+        try:
+            self._request("GET", "/health")
+            return True
+        except (OSError, RuntimeError):
+            return False
+
+    def submit(self, rfp_name, rfp_bytes, top_k=3, quantity=100):
+        query = urllib.parse.urlencode({"name": rfp_name, "top_k": top_k, "quantity": quantity})
+        return self._request("POST", f"/jobs?{query}", body=rfp_bytes)
+
+    def status(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def cancel(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}")
+
+    def result(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}/result")
+
+    def report(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}/report", raw=True)
+
+
+async def serve(host, port, sku_path, workers, queue_size):
+    service = JobService(sku_path, workers=workers, queue_size=queue_size)
+    await service.start()
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"RFP job service listening on http://{host}:{port} ({service.workers} workers)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local RFP job service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--sku-path", default="data/mock_skus.csv")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.sku_path, args.workers, args.queue_size))
@@ -1,53 +1,271 @@
-from sales_agent import SalesAgent
+from sales_agent import METADATA_DEFAULTS, SalesAgent
 from technical_agent import TechnicalAgent
 from pricing_agent import PricingAgent
 from report_generator import ReportGenerator
-import pandas as pd
+from artifact_sink import ArtifactSink
+from catalog_cache import file_digest
+from result_cache import ResultCache
+from result_store import ResultStore
+from rfp_items import iter_chunks
+from tracing import Tracer, current_span, span, traced
+import batch_runner
+import argparse
+import time
 
 class MasterAgent:
     """
     Orchestrates all worker agents and generates final report.
     """
 
-    def __init__(self):
+    def __init__(self, write_artifacts=True, use_cache=True, record_history=True):
         self.rfp_path = "data/sample_rfp.json"
         self.sku_path = "data/mock_skus.csv"
         self.tech_output = "data/technical_matches.csv"
         self.pricing_output = "data/final_pricing_summary.csv"
+        self.report_output = "data/AsianPaints_RFP_Report.pptx"
+        # Intermediate CSVs are optional; stages hand DataFrames over in memory
+        self.write_artifacts = write_artifacts
+        self.top_k = 3
+        self.quantity_per_item = 100
+        # Skipping the report also skips importing python-pptx
+        self.write_report = True
+        # Stream items through matching, pricing and the outputs chunk_size at a time
+        self.stream = False
+        self.chunk_size = 1000
+        # Parsed RFPs, matches and pricing keyed by content (see ResultCache)
+        self.cache = ResultCache() if use_cache else None
+        # Every run's matches and pricing appended to a Parquet history (see ResultStore)
+        self.history = ResultStore() if record_history else None
+        # Optional JSON trace / Prometheus text snapshot of each run (see tracing.py)
+        self.trace_output = None
+        self.metrics_output = None
+        self.tracer = None
+
+    def _cached(self, namespace, key, compute):
+        if self.cache is None or None in key:
+            return compute()
+        return self.cache.fetch(namespace, key, compute)
+
+    def _record(self, table, df, rfp_data, items, catalog_version):
+        if self.history is None:
+            return
+        try:
+            self.history.append(table, df, rfp_data.get("id", "RFP-UNKNOWN"), items=items,
+                                catalog_version=catalog_version)
+        except Exception as e:
+            print(f"⚠️ Result history not updated ({table}): {e}")
 
     def run(self):
+        """Run the workflow; with trace_output/metrics_output set, trace it and save the spans"""
+        if not (self.trace_output or self.metrics_output):
+            return self._run()
+        # A requested trace is a one-off: worth the tracemalloc overhead
+        with Tracer(memory=True) as tracer:
+            final_df = self._run()
+        self.tracer = tracer
+        if self.trace_output:
+            tracer.save_json(self.trace_output)
+        if self.metrics_output:
+            tracer.save_prometheus(self.metrics_output)
+        return final_df
+
+    @traced("master.run")
+    def _run(self):
+        if self.stream:
+            return self._run_streaming()
         print("\nStarting Agentic AI RFP Automation...\n")
+        start = time.perf_counter()
+        sink = ArtifactSink() if self.write_artifacts else None
 
         # 1️⃣ Sales Agent
-        sales = SalesAgent(self.rfp_path)
-        sales.load_rfp()
-        rfp_items = sales.get_rfp_items()
+        with span("sales"):
+            sales = SalesAgent(self.rfp_path)
+            rfp_hash = file_digest(self.rfp_path) if self.cache else None
+
+            def parse_rfp():
+                sales.load_rfp()
+                return sales.rfp_data
+
+            # OCR availability changes what a PDF parses to, so it's part of the key
+            # (and of every key downstream of the parsed items)
+            rfp_key = [rfp_hash, sales.parser_tag() if self.cache else None]
+            sales.rfp_data = self._cached("rfp", rfp_key, parse_rfp)
+            rfp_items = sales.get_rfp_items()
 
         # 2️⃣ Technical Agent
-        tech = TechnicalAgent(self.sku_path)
-        tech.load_sku_data()
-        matches_df = tech.match_rfp_items(rfp_items)
-        matches_df.to_csv(self.tech_output, index=False)
-        print(f"Technical matches saved to {self.tech_output}")
+        with span("technical"):
+            tech = TechnicalAgent(self.sku_path)
+            tech.load_sku_data()
+            match_key = rfp_key + [tech.catalog_version if self.cache else None, self.top_k]
+            matches_df = self._cached("matches", match_key,
+                                      lambda: tech.match_rfp_items(rfp_items, top_k=self.top_k))
+            if sink:
+                sink.write_csv(matches_df, self.tech_output, "Technical matches")
+            self._record("matches", matches_df, sales.rfp_data, rfp_items, tech.catalog_version)
 
         # 3️⃣ Pricing Agent
-        pricing = PricingAgent(self.tech_output)
-        pricing.load_matches()
-        top_df = pricing.select_top_matches()
-        final_df = pricing.calculate_costs(top_df, quantity_per_item=100)
-        final_df.to_csv(self.pricing_output, index=False)
-        print(f"Pricing summary saved to {self.pricing_output}")
+        with span("pricing"):
+            pricing = PricingAgent(matches_df)
+
+            def price():
+                pricing.load_matches()
+                top_df = pricing.select_top_matches()
+                return pricing.calculate_costs(top_df, quantity_per_item=self.quantity_per_item)
+
+            pricing_key = match_key + [self.quantity_per_item, pricing.test_costs, pricing.test_rules]
+            final_df = self._cached("pricing", pricing_key, price)
+            if sink:
+                sink.write_csv(final_df, self.pricing_output, "Pricing summary")
+            self._record("pricing", final_df, sales.rfp_data, rfp_items, tech.catalog_version)
 
         # 4️⃣ Report Generator
-        ppt = ReportGenerator("Industrial Cable Supply (Demo)", final_df)
-        ppt.add_title_slide()
-        ppt.add_process_flow()
-        ppt.add_match_summary()
-        ppt.add_pricing_summary()
-        ppt.add_conclusion_slide()
-        ppt.save_ppt("data/AsianPaints_RFP_Report.pptx")
+        if self.write_report:
+            with span("report"):
+                ppt = ReportGenerator("Industrial Cable Supply (Demo)", final_df)
+                ppt.add_title_slide()
+                ppt.add_process_flow()
+                ppt.add_match_summary()
+                ppt.add_pricing_summary()
+                ppt.add_conclusion_slide()
+                ppt.save_ppt(self.report_output)
+
+        if sink:
+            sink.close()
+        if self.cache:
+            print(f"Result cache: {self.cache.stats()}")
+        print(f"\nWorkflow completed successfully in {time.perf_counter() - start:.2f}s!\n")
+        return final_df
 
-        print("\nWorkflow completed successfully!\n")
+    def _run_streaming(self):
+        """
+        Bounded-memory run: the RFP is read item by item and every
+        chunk_size items are matched, priced, appended to the CSVs and the
+        history and added to the report tables before the next chunk is
+        read, so peak memory doesn't grow with the tender and the first
+        rows are on disk before the document has been fully parsed.
+        Results equal a normal run when item ids are unique (pricing picks
+        one SKU per item id within a chunk). The result cache isn't used.
+        Returns run totals instead of the full pricing DataFrame; an RFP that
+        can't be read to the end raises (after the chunks before the error
+        were written).
+        """
+        print("\nStarting Agentic AI RFP Automation (streaming)...\n")
+        start = time.perf_counter()
+        # At most two chunks' frames queued for disk at a time
+        sink = ArtifactSink(max_pending=4) if self.write_artifacts else None
+
+        tech = TechnicalAgent(self.sku_path)
+        tech.load_sku_data()
+        sales = SalesAgent(self.rfp_path)
+        ppt = None
+        if self.write_report:
+            ppt = ReportGenerator("Industrial Cable Supply (Demo)", None)
+            ppt.add_title_slide()
+            ppt.add_process_flow()
+            ppt.start_table_streams()
+
+        totals = {"items": 0, "chunks": 0, "matches": 0, "total_cost": 0.0}
+        written = {self.tech_output: False, self.pricing_output: False}
+        # History id of every chunk: the RFP id if it was read with the first
+        # chunk (JSON RFPs list it before the items, PDFs on the first page),
+        # else the default, so no chunk waits in memory for it
+        history_rfp = {}
+
+        def write(df, path, label):
+            if sink and len(df):
+                sink.write_csv(df, path, label, append=written[path])
+                written[path] = True
+
+        def record(chunk, matches_df, final_df):
+            if not history_rfp:
+                history_rfp["id"] = sales.rfp_data.get("id", METADATA_DEFAULTS["id"])
+            self._record("matches", matches_df, history_rfp, chunk, tech.catalog_version)
+            self._record("pricing", final_df, history_rfp, chunk, tech.catalog_version)
+
+        try:
+            for chunk in iter_chunks(sales.iter_items(), self.chunk_size):
+                with span("chunk", items=len(chunk)):
+                    with span("technical"):
+                        matches_df = tech.match_rfp_items(chunk, top_k=self.top_k)
+                        write(matches_df, self.tech_output, "Technical matches")
+                    with span("pricing"):
+                        pricing = PricingAgent(matches_df)
+                        pricing.load_matches()
+                        top_df = pricing.select_top_matches()
+                        final_df = pricing.calculate_costs(top_df, quantity_per_item=self.quantity_per_item)
+                        write(final_df, self.pricing_output, "Pricing summary")
+                    if self.history is not None:
+                        record(chunk, matches_df, final_df)
+                    if ppt is not None and len(final_df):
+                        with span("report"):
+                            ppt.add_table_chunk(final_df)
+
+                totals["items"] += len(chunk)
+                totals["chunks"] += 1
+                totals["matches"] += len(matches_df)
+                if len(final_df):
+                    totals["total_cost"] += float(final_df["total_cost"].sum())
+                print(f"📦 Chunk {totals['chunks']}: {len(chunk)} items matched and priced "
+                      f"({totals['items']} so far, {time.perf_counter() - start:.2f}s)")
+        except Exception:
+            # A partial tender is never a finished bid: stop with the error
+            # (rows of the chunks done so far are already on disk)
+            if sink:
+                sink.close()
+            print(f"\n❌ Streaming run failed after {totals['items']} items.\n")
+            raise
+
+        if ppt is not None:
+            with span("report"):
+                ppt.finish_table_streams()
+                ppt.add_conclusion_slide()
+                ppt.save_ppt(self.report_output)
+        if sink:
+            sink.close()
+        current_span().set(items=totals["items"], chunks=totals["chunks"])
+        print(f"\nWorkflow completed successfully in {time.perf_counter() - start:.2f}s!\n")
+        return totals
+
+    def run_batch(self, source, out_root="data/batch_output", workers=None):
+        """
+        Answer many RFPs (a directory or manifest of JSON/PDF files) with a
+        worker pool sharing one SKU catalog; one failing RFP doesn't stop the rest.
+        """
+        return batch_runner.run_batch(source, out_root, self.sku_path, workers=workers,
+                                      top_k=self.top_k, quantity=self.quantity_per_item,
+                                      history_dir=self.history.root if self.history else None)
 
 if __name__ == "__main__":
-    MasterAgent().run()
+    parser = argparse.ArgumentParser(description="Agentic AI RFP automation")
+    parser.add_argument("--trace", default=None, help="save a JSON trace of the run to this path")
+    parser.add_argument("--metrics", default=None, help="save a Prometheus text snapshot to this path")
+    parser.add_argument("--no-history", action="store_true", help="don't append results to data/history")
+    parser.add_argument("--no-report", action="store_true", help="skip the PowerPoint report")
+    parser.add_argument("--stream", action="store_true",
+                        help="process the RFP in chunks with bounded memory (no result cache)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="items per chunk with --stream")
+    commands = parser.add_subparsers(dest="command")
+    batch = commands.add_parser("batch", help="process a directory or manifest of RFPs")
+    batch.add_argument("source", help="folder of .json/.pdf RFPs, or a .txt/.json manifest of paths")
+    batch.add_argument("--out", default="data/batch_output", help="root folder for per-RFP outputs")
+    batch.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    batch.add_argument("--sku-path", default=None, help="SKU catalog CSV")
+    batch.add_argument("--top-k", type=int, default=3)
+    batch.add_argument("--quantity", type=int, default=100, help="quantity per item for pricing")
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        master = MasterAgent(use_cache=False, record_history=not args.no_history)
+        if args.sku_path:
+            master.sku_path = args.sku_path
+        master.top_k = args.top_k
+        master.quantity_per_item = args.quantity
+        master.run_batch(args.source, args.out, workers=args.workers)
+    else:
+        master = MasterAgent(record_history=not args.no_history)
+        master.write_report = not args.no_report
+        master.stream = args.stream
+        master.chunk_size = args.chunk_size
+        master.trace_output = args.trace
+        master.metrics_output = args.metrics
+        master.run()
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+class MatchMemo:
+    """
+    In-process LRU of spec signature -> top-k (SKU positions, scores),
+    keyed by catalog version so a changed catalog never serves stale
+    positions. Repeated cable specs across RFPs handled by the same
+    process (batch workers, the job service, the app) skip matching.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Shared by every TechnicalAgent in the process
+MATCH_MEMO = MatchMemo()
@@ -0,0 +1,332 @@
+import numpy as np
+from catalog_cache import narrow_int_dtype
+from rfp_items import FLOAT, INTEGER, OTHER, TEXT, RfpItems
+
+# Spec columns compared by TechnicalAgent.spec_match_score
+SPEC_COLUMNS = ["conductor_mm2", "insulation", "voltage_kv", "temperature_rating_C"]
+OUTPUT_COLUMNS = ["item_id", "item_description", "sku", "product_name", "match_score", "unit_price"]
+
+# Upper bound on item x SKU cells scored at once (keeps each batch ~tens of MB)
+BATCH_CELLS = 1 << 22
+
+
+def position_dtype(size):
+    """Integer dtype for SKU positions / ranks in a catalog of `size` rows"""
+    return np.int32 if size <= np.iinfo(np.int32).max else np.int64
+
+
+class FrameColumns:
+    """Column access to a SKU catalog held as a pandas DataFrame"""
+
+    def __init__(self, sku_df):
+        self.sku_df = sku_df
+
+    def __len__(self):
+        return len(self.sku_df)
+
+    def numeric(self, col):
+        """Return a column as float64, or None if it isn't numeric"""
+        import pandas as pd
+        series = self.sku_df[col]
+        if not pd.api.types.is_numeric_dtype(series):
+            return None
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    def lowered_codes(self, col):
+        """Return (codes, uniques) of the lower-cased string form of a column"""
+        import pandas as pd
+        lowered = [str(v).lower() for v in self.sku_df[col].tolist()]
+        codes, uniques = pd.factorize(pd.Series(lowered, dtype=object))
+        return codes.astype(narrow_int_dtype(-1, len(uniques))), list(uniques)
+
+    def take(self, sku_idx, col):
+        """Return catalog values of a column for the given SKU positions"""
+        return self.sku_df[col].to_numpy()[sku_idx].tolist()
+
+
+class SkuMatrix:
+    """
+    Column arrays of the SKU catalog used by the vectorized matcher.
+    Numeric specs are kept in the source's dtype (a compiled catalog stores
+    them as narrow as float64 round trips allow; scoring promotes to
+    float64, so results are exact), every other comparison goes through
+    int8/int16 codes of the lower-cased string value.
+    Accepts a DataFrame or any source with the FrameColumns methods
+    (e.g. a CompiledCatalog).
+    """
+
+    def __init__(self, source):
+        if not hasattr(source, "lowered_codes"):
+            source = FrameColumns(source)
+        self.source = source
+        self.size = len(source)
+        self.numeric = {}
+        for col in SPEC_COLUMNS:
+            values = source.numeric(col)
+            if values is not None:
+                self.numeric[col] = values
+        self._codes = {}
+
+        # Position of every SKU in (unit_price asc, catalog order) — the
+        # tie-break used by the row-wise matcher after the score.
+        prices = source.numeric("unit_price")
+        order = np.lexsort((np.arange(self.size), prices))
+        self.price_rank = np.empty(self.size, dtype=position_dtype(self.size))
+        self.price_rank[order] = np.arange(self.size)
+
+    def string_codes(self, col):
+        """Return (codes, vocabulary) for the lower-cased string form of a column"""
+        if col not in self._codes:
+            codes, uniques = self.source.lowered_codes(col)
+            self._codes[col] = (codes, {u: i for i, u in enumerate(uniques)})
+        return self._codes[col]
+
+    def take(self, sku_idx, col):
+        """Return catalog values of a column for the given SKU positions"""
+        return self.source.take(sku_idx, col)
+
+
+class ItemBatch:
+    """
+    RFP items encoded column-wise, mirroring the per-spec branches of
+    spec_match_score (numeric tolerance vs. case-insensitive string).
+    """
+
+    def __init__(self, items, matrix: SkuMatrix):
+        self.items = items
+        self.matrix = matrix
+        self.numeric = {}
+        self.strings = {}
+        if isinstance(items, RfpItems):
+            self.totals = items.spec_counts()
+            for col in SPEC_COLUMNS:
+                if col in items.specs:
+                    self._encode_column(col, items.specs[col])
+            return
+
+        n = len(items)
+        self.totals = np.array([len(item["specs"]) for item in items], dtype=np.int64)
+        for col in SPEC_COLUMNS:
+            values = np.full(n, np.nan)
+            codes = np.full(n, -1, dtype=np.int32)
+            for i, item in enumerate(items):
+                if col in item["specs"]:
+                    self._encode(col, item["specs"][col], i, values, codes)
+            self._keep(col, values, codes)
+
+    def _encode(self, col, v, i, values, codes):
+        """Encode one spec value the way spec_match_score compares it"""
+        if col in self.matrix.numeric and isinstance(v, (int, float)):
+            values[i] = v
+        else:
+            _, vocab = self.matrix.string_codes(col)
+            codes[i] = vocab.get(str(v).lower(), -2)
+
+    def _keep(self, col, values, codes):
+        if not np.isnan(values).all():
+            self.numeric[col] = values
+        if (codes != -1).any():
+            self.strings[col] = codes
+
+    def _encode_column(self, col, spec):
+        """Column-at-a-time encoding of a SpecColumn (bools, None etc. go value by value)"""
+        n = len(spec.kinds)
+        values = np.full(n, np.nan)
+        codes = np.full(n, -1, dtype=np.int32)
+        numbers = (spec.kinds == INTEGER) | (spec.kinds == FLOAT)
+        if col in self.matrix.numeric:
+            values[numbers] = spec.numbers[numbers]
+            one_by_one = spec.kinds == OTHER
+        else:
+            one_by_one = numbers | (spec.kinds == OTHER)
+        text = spec.kinds == TEXT
+        if text.any():
+            _, vocab = self.matrix.string_codes(col)
+            lookup = np.array([vocab.get(v.lower(), -2) for v in spec.vocab], dtype=np.int32)
+            codes[text] = lookup[spec.codes[text]]
+        for i in np.flatnonzero(one_by_one).tolist():
+            self._encode(col, spec.value(i), i, values, codes)
+        self._keep(col, values, codes)
+
+    def __len__(self):
+        return len(self.items)
+
+    def signatures(self):
+        """
+        (items x signature) float64 rows of everything matching reads about
+        an item: each spec's value and code, and the spec count. Items
+        with equal rows get the same matches.
+        """
+        n = len(self)
+        rows = np.empty((n, 2 * len(SPEC_COLUMNS) + 1))
+        for j, col in enumerate(SPEC_COLUMNS):
+            rows[:, 2 * j] = self.numeric[col] if col in self.numeric else np.nan
+            rows[:, 2 * j + 1] = self.strings[col] if col in self.strings else -1
+        rows[:, -1] = self.totals
+        # One NaN bit pattern and no -0.0, so equal rows are equal byte for byte
+        rows[np.isnan(rows)] = np.nan
+        return rows + 0.0
+
+
+def unique_signatures(batch: ItemBatch):
+    """
+    (signature rows, first item of each, signature of each item) with
+    signatures numbered in order of first appearance
+    """
+    rows = batch.signatures()
+    keys = rows.view(np.dtype((np.void, rows.itemsize * rows.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    renumber = np.empty_like(order)
+    renumber[order] = np.arange(len(order))
+    return rows[first[order]], first[order], renumber[inverse.ravel()]
+
+
+def score_tables(totals):
+    """
+    Precompute the match score and a rank for every (spec count, matched)
+    pair so the batch path returns the same rounded floats as the
+    row-wise matcher and orders them identically.
+    """
+    unique_totals = np.unique(totals)
+    width = len(SPEC_COLUMNS) + 1
+    scores = np.zeros((len(unique_totals), width))
+    ranks = np.zeros((len(unique_totals), width), dtype=np.int64)
+    for t_idx, total in enumerate(unique_totals.tolist()):
+        row = [round((m / total) * 100, 2) for m in range(width)]
+        order = sorted(set(row), reverse=True)
+        scores[t_idx] = row
+        ranks[t_idx] = [order.index(s) for s in row]
+    return unique_totals, scores, ranks
+
+
+def count_matches(batch: ItemBatch, matrix: SkuMatrix, rows: slice, skus=slice(None)):
+    """Return an (items x SKUs) matrix with the number of matched specs (SKUs limited to `skus`)"""
+    n_rows = len(range(*rows.indices(len(batch))))
+    n_skus = len(range(*skus.indices(matrix.size)))
+    matched = np.zeros((n_rows, n_skus), dtype=np.int8)
+    for col, values in batch.numeric.items():
+        v = values[rows][:, None]
+        tolerance = np.maximum(0.1, 0.1 * np.abs(v))
+        matched += np.abs(v - matrix.numeric[col][None, skus]) <= tolerance
+    for col, codes in batch.strings.items():
+        sku_codes, _ = matrix.string_codes(col)
+        c = codes[rows][:, None]
+        matched += (c >= 0) & (c == sku_codes[None, skus])
+    return matched
+
+
+def select_top_k(keys, top_k):
+    """Return per-row column indices of the top_k smallest keys, in order"""
+    n = keys.shape[1]
+    if top_k < n:
+        part = np.argpartition(keys, top_k - 1, axis=1)[:, :top_k]
+    else:
+        part = np.broadcast_to(np.arange(n), keys.shape)
+    order = np.argsort(np.take_along_axis(keys, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+def match_items(items, matrix: SkuMatrix, top_k=3, batch_cells=BATCH_CELLS, as_frame=True):
+    """
+    Score every RFP item against the whole catalog in batches and keep
+    the top-k per item ordered by (score desc, unit_price asc).
+    as_frame=False returns the MatchResult arrays instead of a DataFrame.
+    """
+    if not len(items) or matrix.size == 0 or top_k <= 0:
+        return MatchResult.empty(items, matrix).finish(as_frame)
+
+    batch = ItemBatch(items, matrix)
+    unique_totals, score_table, rank_table = score_tables(batch.totals)
+    total_idx = np.searchsorted(unique_totals, batch.totals)
+    batch_rows = max(1, batch_cells // matrix.size)
+
+    item_pos, sku_pos, scores = [], [], []
+    for start in range(0, len(batch), batch_rows):
+        rows = slice(start, min(start + batch_rows, len(batch)))
+        matched = count_matches(batch, matrix, rows)
+        t = total_idx[rows][:, None]
+        keys = rank_table[t, matched] * matrix.size + matrix.price_rank[None, :]
+        top = select_top_k(keys, top_k)
+        top_matched = np.take_along_axis(matched, top, axis=1)
+        item_pos.append(np.repeat(np.arange(rows.start, rows.stop, dtype=np.int32), top.shape[1]))
+        sku_pos.append(top.ravel().astype(matrix.price_rank.dtype))
+        scores.append(score_table[t, top_matched].ravel())
+
+    return MatchResult(items, matrix, np.concatenate(item_pos),
+                       np.concatenate(sku_pos), np.concatenate(scores)).finish(as_frame)
+
+
+class MatchResult:
+    """
+    Top-k matches as parallel arrays — item position, SKU position and
+    score per row (items in input order, best match first) — instead of a
+    row dict per match. to_frame() builds the match_rfp_items DataFrame.
+    """
+
+    __slots__ = ("items", "matrix", "item_pos", "sku_pos", "scores")
+
+    def __init__(self, items, matrix, item_pos, sku_pos, scores):
+        self.items = items
+        self.matrix = matrix
+        self.item_pos = item_pos
+        self.sku_pos = sku_pos
+        self.scores = scores
+
+    @classmethod
+    def empty(cls, items, matrix):
+        positions = np.empty(0, dtype=np.int32)
+        return cls(items, matrix, positions, positions, np.empty(0))
+
+    def __len__(self):
+        return len(self.item_pos)
+
+    def to_frame(self):
+        if not len(self):
+            import pandas as pd
+            return pd.DataFrame([])
+        return build_frame(self.items, self.matrix, self.item_pos, self.sku_pos, self.scores)
+
+    def finish(self, as_frame):
+        return self.to_frame() if as_frame else self
+
+
+def take_items(items, rows):
+    """The items at the given positions (an RfpItems stays an RfpItems)"""
+    if isinstance(items, RfpItems):
+        return items.take(rows)
+    return [items[i] for i in np.asarray(rows).tolist()]
+
+
+def expand_matches(items, matrix, sku_pos, scores, starts, inverse):
+    """
+    MatchResult for items from matches computed once per signature:
+    signature s owns rows starts[s]:starts[s + 1] of sku_pos/scores and
+    item i has signature inverse[i].
+    """
+    counts = (starts[1:] - starts[:-1])[inverse]
+    item_pos = np.repeat(np.arange(len(inverse), dtype=np.int32), counts)
+    item_starts = np.cumsum(counts) - counts
+    rows = np.repeat(starts[:-1][inverse] - item_starts, counts) + np.arange(counts.sum())
+    return MatchResult(items, matrix, item_pos, sku_pos[rows], scores[rows])
+
+
+def item_columns(items):
+    """(item ids, descriptions) of a list of item dicts or an RfpItems"""
+    if isinstance(items, RfpItems):
+        return items.item_ids, items.descriptions
+    return [item["item_id"] for item in items], [item["description"] for item in items]
+
+
+def build_frame(items, matrix, item_pos, sku_pos, scores):
+    """Assemble the match rows in the layout returned by match_rfp_items"""
+    import pandas as pd
+    item_ids, descriptions = item_columns(items)
+    return pd.DataFrame({
+        "item_id": [item_ids[i] for i in item_pos.tolist()],
+        "item_description": [descriptions[i] for i in item_pos.tolist()],
+        "sku": matrix.take(sku_pos, "sku"),
+        "product_name": matrix.take(sku_pos, "product_name"),
+        "match_score": scores.tolist(),
+        "unit_price": matrix.take(sku_pos, "unit_price"),
+    }, columns=OUTPUT_COLUMNS)
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+
+DEFAULT_OCR_CACHE_DIR = "data/.ocr_cache"
+OCR_DPI = 300
+OCR_LANG = "eng"
+# Pages with fewer extractable characters than this count as scanned
+MIN_TEXT_CHARS = 20
+# An image covering this share of a table-less page is treated as a scan
+SCAN_IMAGE_RATIO = 0.5
+# Horizontal gap (in word heights) that separates two table cells on a line
+CELL_GAP_RATIO = 1.2
+
+
+def needs_ocr(page):
+    """True for pages without a text layer, or whose content is a page-sized image with no table"""
+    if len(page.chars) < MIN_TEXT_CHARS:
+        return True
+    page_area = float(page.width * page.height) or 1.0
+    scanned = any(float(img["width"] * img["height"]) >= SCAN_IMAGE_RATIO * page_area for img in page.images)
+    return scanned and not page.find_tables()
+
+
+def page_key(page, dpi=OCR_DPI):
+    """Digest of everything that decides how a page renders: content streams, images, size, dpi"""
+    from pdfminer.pdftypes import resolve1
+    digest = hashlib.sha256(f"{dpi}:{page.width}:{page.height}:{page.rotation}".encode())
+    contents = resolve1(page.page_obj.attrs.get("Contents"))
+    for stream in contents if isinstance(contents, list) else [contents]:
+        stream = resolve1(stream)
+        if stream is not None:
+            digest.update(stream.get_data())
+    for img in page.images:
+        stream = img["stream"]
+        raw = stream.get_rawdata()
+        digest.update(raw if raw is not None else stream.get_data())
+    return digest.hexdigest()
+
+
+def ocr_unavailable():
+    """Why OCR can't run here (missing package or Tesseract binary), or None"""
+    try:
+        import pdf2image  # noqa: F401
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+class OcrCache:
+    """
+    Rendered page images (PNG) and OCR words (JSON) on disk, keyed by
+    page_key, so re-parsing a scanned tender skips the expensive steps.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_OCR_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def _write(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def get_words(self, key, lang):
+        try:
+            with open(self._path(key, f".{lang}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_words(self, key, lang, words):
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(words, f)
+        self._write(self._path(key, f".{lang}.json"), write)
+
+    def get_image(self, key):
+        from PIL import Image
+        try:
+            image = Image.open(self._path(key, ".png"))
+            image.load()
+            return image
+        except OSError:
+            return None
+
+    def put_image(self, key, image):
+        self._write(self._path(key, ".png"), lambda path: image.save(path, format="PNG"))
+
+
+def ocr_page(task):
+    """
+    Process-pool worker: rasterize one PDF page and OCR it (both steps cached).
+    Returns the recognised words as [text, left, top, width, height].
+    """
+    pdf_path, page_number, key, cache_dir, dpi, lang = task
+    cache = OcrCache(cache_dir)
+    words = cache.get_words(key, lang)
+    if words is not None:
+        return words
+
+    image = cache.get_image(key)
+    if image is None:
+        from pdf2image import convert_from_path
+        image = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+        cache.put_image(key, image)
+
+    import pytesseract
+    data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+    words = [
+        [text.strip(), left, top, width, height]
+        for text, conf, left, top, width, height in zip(
+            data["text"], data["conf"], data["left"], data["top"], data["width"], data["height"])
+        if text.strip() and float(conf) >= 0
+    ]
+    cache.put_words(key, lang, words)
+    return words
+
+
+def layout_lines(words):
+    """Group OCR words into visual lines by vertical centre, each line sorted left to right"""
+    lines = []
+    for word in sorted(words, key=lambda w: w[2] + w[4] / 2):
+        centre = word[2] + word[4] / 2
+        if lines and abs(centre - lines[-1]["centre"]) <= max(word[4], lines[-1]["height"]) / 2:
+            line = lines[-1]
+            line["words"].append(word)
+            line["centre"] += (centre - line["centre"]) / len(line["words"])
+            line["height"] = max(line["height"], word[4])
+        else:
+            lines.append({"words": [word], "centre": centre, "height": word[4]})
+    return [sorted(line["words"], key=lambda w: w[1]) for line in lines]
+
+
+def line_cells(line):
+    """Split a line into table cells wherever the gap between words is wider than a space"""
+    heights = sorted(w[4] for w in line)
+    max_gap = CELL_GAP_RATIO * heights[len(heights) // 2]
+    cells = [[line[0][0]]]
+    for prev, word in zip(line, line[1:]):
+        if word[1] - (prev[1] + prev[3]) > max_gap:
+            cells.append([])
+        cells[-1].append(word[0])
+    return [" ".join(cell) for cell in cells]
+
+
+def ocr_rows(words, columns=6):
+    """
+    Rebuild the page text and item table rows from OCR word boxes.
+    A line whose cells don't come out as `columns` cells is read as
+    item id, description words, then one token per remaining column.
+    """
+    lines = layout_lines(words)
+    text = "\n".join(" ".join(w[0] for w in line) for line in lines)
+    rows = []
+    for line in lines:
+        cells = line_cells(line)
+        if len(cells) != columns:
+            tokens = [w[0] for w in line]
+            if len(tokens) < columns:
+                continue
+            tail = columns - 2
+            cells = [tokens[0], " ".join(tokens[1:-tail])] + tokens[-tail:]
+        rows.append(cells)
+    return text, rows
+
+
+class PageOcr:
+    """
+    OCR for the scanned pages of one PDF (see needs_ocr). Pages are
+    submitted as the parser finds them and recognised in a process pool
+    while parsing continues; each submit returns a future of (text, rows).
+    If pdf2image/pytesseract or their binaries are missing, scanned pages
+    come back empty (cached results are still used) and the parser keeps
+    whatever text layer they have.
+    source: the PDF path, or its bytes (spilled to a temp file for rendering).
+    """
+
+    def __init__(self, source, workers=None, cache_dir=DEFAULT_OCR_CACHE_DIR, dpi=OCR_DPI, lang=OCR_LANG):
+        self.source = source
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = OcrCache(cache_dir)
+        self.dpi = dpi
+        self.lang = lang
+        self.pool = None
+        self._pdf_path = source if isinstance(source, str) else None
+        self._tmp_path = None
+        # ocr_unavailable() result, checked on the first uncached page
+        self._unavailable = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self._tmp_path is not None:
+            os.remove(self._tmp_path)
+            self._tmp_path = None
+
+    def _path(self):
+        if self._pdf_path is None:
+            fd, self._tmp_path = tempfile.mkstemp(suffix=".pdf")
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.source)
+            self._pdf_path = self._tmp_path
+        return self._pdf_path
+
+    def unavailable(self):
+        """ocr_unavailable(), checked once per instance (it starts a tesseract subprocess)"""
+        if self._unavailable is None:
+            self._unavailable = ocr_unavailable() or ""
+            if self._unavailable:
+                print(f"⚠️ OCR unavailable, scanned pages keep only their text layer ({self._unavailable})")
+        return self._unavailable or None
+
+    def submit(self, page):
+        key = page_key(page, self.dpi)
+        words = self.cache.get_words(key, self.lang)
+        future = Future()
+        if words is None and self.unavailable() is None:
+            task = (self._path(), page.page_number, key, self.cache.cache_dir, self.dpi, self.lang)
+            if self.workers > 1:
+                if self.pool is None:
+                    self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                return _RowsFuture(self.pool.submit(ocr_page, task))
+            try:
+                words = ocr_page(task)
+            except Exception as e:
+                # Raised from result() like a pool failure, so the page keeps its text layer
+                future.set_exception(e)
+                return future
+        future.set_result(ocr_rows(words or []))
+        return future
+
+
+class _RowsFuture:
+    """Wraps a pool future of OCR words as a future of (text, rows)"""
+
+    def __init__(self, future):
+        self.future = future
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return ocr_rows(self.future.result())
@@ -1,4 +1,31 @@
-import pandas as pd
+import itertools
+import os
+import numpy as np
+from tracing import current_span, traced
+
+# Upper bound on (item x candidate x scenario) cells evaluated at once
+SCENARIO_CELLS = 4_000_000
+
+
+def scenario_grid(quantities=(100,), discounts=(None,), test_bundles=(None,), min_scores=(0,)):
+    """
+    Every combination of the given axes as a list of scenario dicts for
+    PricingAgent.price_scenarios (see there for the keys).
+    """
+    scenarios = []
+    for quantity, tiers, tests, min_score in itertools.product(quantities, discounts, test_bundles, min_scores):
+        scenarios.append({"name": f"s{len(scenarios)}", "quantity": quantity, "discounts": tiers,
+                          "tests": tests, "min_score": min_score})
+    return scenarios
+
+
+def discount_rate(quantity, tiers):
+    """Rate of the highest volume tier [(min_quantity, rate), ...] the quantity reaches (0 if none)"""
+    rate = 0.0
+    for min_quantity, tier_rate in sorted(tiers or []):
+        if quantity >= min_quantity:
+            rate = tier_rate
+    return rate
 
 class PricingAgent:
     """
@@ -6,9 +33,14 @@ class PricingAgent:
     including product unit price, quantity, and testing costs.
     """
 
-    def __init__(self, matches_path: str):
-        self.matches_path = matches_path
-        self.matches_df = None
+    def __init__(self, matches):
+        # matches: path to the Technical Agent CSV, or its DataFrame in memory
+        if isinstance(matches, (str, os.PathLike)):
+            self.matches_path = matches
+            self.matches_df = None
+        else:
+            self.matches_path = None
+            self.matches_df = matches
 
         # Define test cost table (mock data)
         self.test_costs = {
@@ -18,70 +50,219 @@ class PricingAgent:
             "Armor Integrity Test": 350
         }
 
+        # Which tests apply to a SKU: None = every SKU, otherwise a
+        # substring that must appear in any of the listed columns
+        self.test_rules = {
+            "Tensile Test": None,
+            "Insulation Resistance": None,
+            "Voltage Withstand Test": None,
+            "Armor Integrity Test": ("Armour", ["product_name", "sku"]),
+        }
+
     def load_matches(self):
-        """Load matches CSV from Technical Agent"""
+        """Load matches CSV from Technical Agent (no-op if given a DataFrame)"""
+        if self.matches_path is None:
+            print(f"Using in-memory matches with {len(self.matches_df)} rows.")
+            return
         try:
+            import pandas as pd
             self.matches_df = pd.read_csv(self.matches_path)
             print(f"Loaded matches file with {len(self.matches_df)} rows.")
         except Exception as e:
             print(f" Error loading matches: {e}")
 
+    @traced("pricing.select_top")
     def select_top_matches(self):
         """
-        Select the best SKU (top-1) for each RFP item.
+        Select the best SKU (top-1) for each RFP item:
+        highest match_score, then lowest unit_price, then first listed.
         """
         if self.matches_df is None:
             print("Please load matches first.")
             return None
 
-        top_df = (
-            self.matches_df.sort_values(["item_id", "match_score", "unit_price"],
-                                        ascending=[True, False, True])
-            .groupby("item_id")
-            .head(1)
-            .reset_index(drop=True)
-        )
+        df = self.matches_df.reset_index(drop=True)
+        best_score = df.groupby("item_id", sort=False)["match_score"].transform("max")
+        best = df[df["match_score"] == best_score]
+        top_idx = best.groupby("item_id")["unit_price"].idxmin()
+        top_df = df.loc[top_idx.to_numpy()].reset_index(drop=True)
         print(f"Selected {len(top_df)} top matches (1 per item).")
+        current_span().set(rows=len(df), selected=len(top_df))
         return top_df
 
+    def compile_test_rules(self, selected_df):
+        """
+        Evaluate test_rules against the SKU columns once.
+        Returns (test names, rows x tests boolean matrix).
+        """
+        names = list(self.test_rules)
+        rules = np.zeros((len(selected_df), len(names)), dtype=bool)
+        for j, name in enumerate(names):
+            rule = self.test_rules[name]
+            if rule is None:
+                rules[:, j] = True
+                continue
+            substring, columns = rule
+            for col in columns:
+                rules[:, j] |= selected_df[col].str.contains(substring, regex=False).to_numpy(dtype=bool)
+        return names, rules
+
+    @traced("pricing.calculate_costs")
     def calculate_costs(self, selected_df, quantity_per_item=100):
         """
         Add total cost calculation for each item.
         Formula: total = (unit_price × quantity) + (test_cost × quantity)
+        Test costs are one rule-matrix × cost-vector product over all rows.
         """
-        results = []
-        for _, row in selected_df.iterrows():
-            sku_name = row["product_name"]
-            qty = quantity_per_item
-            unit_price = row["unit_price"]
-
-            # Simple logic: if 'Armour' in name → add Armor Integrity Test
-            tests = ["Tensile Test", "Insulation Resistance", "Voltage Withstand Test"]
-            if "Armour" in sku_name or "Armour" in row["sku"]:
-                tests.append("Armor Integrity Test")
-
-            total_test_cost = sum(self.test_costs[t] for t in tests)
-            material_cost = qty * unit_price
-            total_cost = material_cost + total_test_cost * qty
-
-            results.append({
-                "item_id": row["item_id"],
-                "item_description": row["item_description"],
-                "sku": row["sku"],
-                "product_name": sku_name,
-                "match_score": row["match_score"],
-                "quantity": qty,
-                "unit_price": unit_price,
-                "material_cost": material_cost,
-                "tests": ", ".join(tests),
-                "tests_cost_per_unit": total_test_cost,
-                "total_cost": total_cost
-            })
-
-        df = pd.DataFrame(results)
+        import pandas as pd
+        if len(selected_df) == 0:
+            print(" Pricing calculation completed.")
+            return pd.DataFrame([])
+
+        names, rules = self.compile_test_rules(selected_df)
+        costs = np.array([self.test_costs[t] for t in names])
+        tests_cost = rules @ costs
+
+        # One joined test list per distinct rule pattern, not per row
+        patterns, pattern_idx = np.unique(rules, axis=0, return_inverse=True)
+        labels = np.array([", ".join(t for t, on in zip(names, row) if on) for row in patterns], dtype=object)
+
+        qty = quantity_per_item
+        unit_price = selected_df["unit_price"].to_numpy()
+        material_cost = qty * unit_price
+
+        df = pd.DataFrame({
+            "item_id": selected_df["item_id"].to_numpy(),
+            "item_description": selected_df["item_description"].to_numpy(),
+            "sku": selected_df["sku"].to_numpy(),
+            "product_name": selected_df["product_name"].to_numpy(),
+            "match_score": selected_df["match_score"].to_numpy(),
+            "quantity": np.full(len(selected_df), qty),
+            "unit_price": unit_price,
+            "material_cost": material_cost,
+            "tests": labels[pattern_idx.ravel()].tolist(),
+            "tests_cost_per_unit": tests_cost,
+            "total_cost": material_cost + tests_cost * qty,
+        })
+        current_span().set(rows_priced=len(df))
         print(" Pricing calculation completed.")
         return df
 
+    def candidate_arrays(self):
+        """
+        The matches as (items x candidates) arrays, candidates of an item
+        in select_top_matches order (score desc, unit_price asc, listed
+        order) and padded with -1 rows. Returns (row index, first rows).
+        """
+        import pandas as pd
+        df = self.matches_df.reset_index(drop=True)
+        item = pd.factorize(df["item_id"])[0]
+        order = np.lexsort((np.arange(len(df)), df["unit_price"].to_numpy(), -df["match_score"].to_numpy(), item))
+        item = item[order]
+        starts = np.flatnonzero(np.r_[True, item[1:] != item[:-1]])
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        rows = np.full((len(starts), rank.max() + 1), -1, dtype=np.int64)
+        rows[item, rank] = order
+        return rows, order[starts]
+
+    @traced("pricing.scenarios")
+    def price_scenarios(self, scenarios, detail=True):
+        """
+        Price every candidate SKU of every item (all top-k matches) under
+        each scenario in one broadcast (item x candidate x scenario) cost
+        cube, and pick the cheapest compliant candidate per item and scenario.
+        A scenario is a dict with optional keys:
+          name       label (default "s<position>")
+          quantity   units per item (default 100)
+          discounts  volume tiers [(min_quantity, rate), ...] off the material cost
+          tests      test names in the bundle (default: every test in test_costs);
+                     a SKU pays for the bundle's tests its test_rules apply to
+          min_score  lowest match_score that counts as compliant (default 0)
+        Returns (summary, choices): one row per scenario with its totals, and
+        (if detail) one row per scenario and item with the chosen SKU.
+        """
+        import pandas as pd
+        if self.matches_df is None or len(self.matches_df) == 0 or not scenarios:
+            return pd.DataFrame([]), pd.DataFrame([])
+        df = self.matches_df.reset_index(drop=True)
+        rows, first = self.candidate_arrays()
+        valid = rows >= 0
+        safe = np.where(valid, rows, 0)
+        unit_price = df["unit_price"].to_numpy(dtype=np.float64)[safe]
+        score = np.where(valid, df["match_score"].to_numpy(dtype=np.float64)[safe], -np.inf)
+
+        names, rules = self.compile_test_rules(df)
+        costs = np.array([self.test_costs[t] for t in names], dtype=np.float64)
+        labels = [s.get("name", f"s{i}") for i, s in enumerate(scenarios)]
+        quantities = np.array([s.get("quantity", 100) for s in scenarios])
+        quantity = quantities.astype(np.float64)
+        discount = np.array([discount_rate(q, s.get("discounts")) for q, s in zip(quantities.tolist(), scenarios)])
+        min_score = np.array([s.get("min_score", 0) for s in scenarios], dtype=np.float64)
+        bundle = np.array([[s.get("tests") is None or t in s["tests"] for t in names] for s in scenarios], dtype=bool)
+
+        n_items, n_cand = rows.shape
+        step = max(1, SCENARIO_CELLS // (n_items * n_cand))
+        candidate_rules = rules[safe]
+        choice = np.empty((n_items, len(scenarios)), dtype=np.int64)
+        for start in range(0, len(scenarios), step):
+            s = slice(start, start + step)
+            # (items x candidates x scenarios): per-unit price after discount plus bundle tests
+            tests_cost = candidate_rules @ (bundle[s] * costs).T
+            total = quantity[s] * ((1 - discount[s]) * unit_price[:, :, None] + tests_cost)
+            total[score[:, :, None] < min_score[s]] = np.inf
+            choice[:, s] = np.argmin(total, axis=1)
+        chosen = np.take_along_axis(rows, choice, axis=1)
+        priced = np.take_along_axis(score, choice, axis=1) >= min_score
+        chosen_safe = np.where(priced, chosen, 0)
+
+        chosen_rules = rules[chosen_safe] & bundle[None, :, :]
+        tests_per_unit = np.where(priced, chosen_rules @ costs, np.nan)
+        chosen_price = df["unit_price"].to_numpy(dtype=np.float64)[chosen_safe]
+        material = np.where(priced, quantity * (1 - discount) * chosen_price, np.nan)
+        total_cost = material + tests_per_unit * quantity
+
+        summary = pd.DataFrame({
+            "scenario": labels,
+            "quantity": quantities,
+            "discount": discount,
+            "tests": [", ".join(t for t, on in zip(names, row) if on) for row in bundle],
+            "min_score": min_score,
+            "items_priced": priced.sum(axis=0),
+            "items_unpriced": (~priced).sum(axis=0),
+            "material_cost": np.nansum(material, axis=0),
+            "tests_cost": np.nansum(tests_per_unit * quantity, axis=0),
+            "total_cost": np.nansum(total_cost, axis=0),
+        })
+        current_span().set(items=n_items, candidates=int(valid.sum()), scenarios=len(scenarios))
+        if not detail:
+            return summary, pd.DataFrame([])
+
+        # One row per (scenario, item): scenario-major, items in first-seen order
+        pick = chosen_safe.T.ravel()
+        keep = priced.T.ravel()
+        # Tests as a bitmask per row, one joined label per distinct mask
+        masks, mask_idx = np.unique(chosen_rules.transpose(1, 0, 2) @ (1 << np.arange(len(names))),
+                                    return_inverse=True)
+        test_labels = np.array([", ".join(t for j, t in enumerate(names) if mask >> j & 1)
+                                for mask in masks.tolist()], dtype=object)
+        item_rows = np.tile(first, len(scenarios))
+        choices = pd.DataFrame({
+            "scenario": np.repeat(np.array(labels, dtype=object), n_items),
+            "item_id": df["item_id"].to_numpy()[item_rows],
+            "item_description": df["item_description"].to_numpy()[item_rows],
+            "sku": np.where(keep, df["sku"].to_numpy()[pick], None),
+            "product_name": np.where(keep, df["product_name"].to_numpy()[pick], None),
+            "match_score": np.where(keep, df["match_score"].to_numpy(dtype=np.float64)[pick], np.nan),
+            "quantity": np.repeat(quantities, n_items),
+            "unit_price": np.where(keep, df["unit_price"].to_numpy(dtype=np.float64)[pick], np.nan),
+            "discount": np.repeat(discount, n_items),
+            "material_cost": material.T.ravel(),
+            "tests": np.where(keep, test_labels[mask_idx.ravel()], None),
+            "tests_cost_per_unit": tests_per_unit.T.ravel(),
+            "total_cost": total_cost.T.ravel(),
+        })
+        return summary, choices
+
 # ---- Run for testing ----
 if __name__ == "__main__":
     pricing = PricingAgent("data/technical_matches.csv")
@@ -93,3 +274,9 @@ if __name__ == "__main__":
     print("\nFinal Pricing Summary:\n", final_df)
     final_df.to_csv("data/final_pricing_summary.csv", index=False)
     print("\n Saved results to data/final_pricing_summary.csv")
+
+    # What-if grid over every candidate SKU, not just the top match
+    grid = scenario_grid(quantities=[100, 500, 1000], discounts=[None, [(500, 0.05), (1000, 0.1)]],
+                         test_bundles=[None, ["Tensile Test", "Insulation Resistance"]])
+    summary, _ = pricing.price_scenarios(grid, detail=False)
+    print("\nScenario Totals:\n", summary[["scenario", "quantity", "discount", "tests", "total_cost"]])
@@ -1,18 +1,129 @@
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.enum.text import PP_ALIGN
-from pptx.dml.color import RGBColor
-import pandas as pd
+import copy
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from tracing import current_span, traced
+
+# python-pptx is imported when a deck is built, so importing this module stays cheap
+ROWS_PER_SLIDE = 15
+# Lengths in EMU (914400 per inch, 12700 per point)
+ROW_HEIGHT = 301752  # 0.33 in
+BODY_FONT_SIZE = 152400  # 12 pt
+
+MATCH_COLUMNS = [("Item ID", "item_id"), ("Item Description", "item_description"),
+                 ("Selected SKU", "sku"), ("Match Score (%)", "match_score")]
+PRICING_COLUMNS = [("Item ID", "item_id"), ("Quantity", "quantity"),
+                   ("Unit Price (₹)", "unit_price"), ("Total Cost (₹)", "total_cost")]
+
+# Text python-pptx would rewrite (line breaks, control characters) goes
+# through cell.text instead of the bulk path
+_SPECIAL_TEXT = re.compile(r"[\x00-\x1f\x7f]")
+
+# Per-process caches: template deck bytes by path, table prototypes by headers
+_template_bytes = {}
+_table_prototypes = {}
+
+
+def load_template(template_path=None):
+    """Bytes of the base deck (python-pptx default when None), read once per process"""
+    if template_path not in _template_bytes:
+        if template_path is None:
+            from pptx import Presentation
+            buffer = io.BytesIO()
+            Presentation().save(buffer)
+            _template_bytes[None] = buffer.getvalue()
+        else:
+            with open(template_path, "rb") as f:
+                _template_bytes[template_path] = f.read()
+    return _template_bytes[template_path]
+
+
+def table_prototype(headers):
+    """
+    Table graphic frame with a bold header row and one styled body row,
+    built once per process and deep-copied for every table slide.
+    """
+    key = tuple(headers)
+    if key not in _table_prototypes:
+        from pptx import Presentation
+        from pptx.util import Emu, Inches
+        prs = Presentation()
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        shape = slide.shapes.add_table(2, len(headers), Inches(0.5), Inches(1.8), Inches(9), Emu(ROW_HEIGHT * 2))
+        table = shape.table
+        for i, h in enumerate(headers):
+            table.cell(0, i).text = h
+            table.cell(0, i).text_frame.paragraphs[0].font.bold = True
+            table.cell(1, i).text = " "
+            table.cell(1, i).text_frame.paragraphs[0].runs[0].font.size = Emu(BODY_FONT_SIZE)
+        for row in table.rows:
+            row.height = Emu(ROW_HEIGHT)
+        _table_prototypes[key] = shape._element
+    return _table_prototypes[key]
+
+
+def table_rows(df, columns):
+    """Rows of cell texts: one column at a time to Python values, then str() as cell.text would see them"""
+    values = [[str(v) for v in df[col].tolist()] for _, col in columns]
+    return list(zip(*values))
+
+
+def page_title(title, page, pages):
+    return title if pages == 1 else f"{title} ({page + 1}/{pages})"
+
+
+class TableStream:
+    """
+    Table slides filled from DataFrame chunks as they arrive: full slides
+    are added right away, the remainder waits for the next chunk. Page
+    numbers go into the titles in finish(), once the total is known.
+    """
+
+    def __init__(self, report, title, columns, rows_per_slide=ROWS_PER_SLIDE):
+        self.report = report
+        self.title = title
+        self.columns = columns
+        self.rows_per_slide = rows_per_slide
+        self.prototype = table_prototype([header for header, _ in columns])
+        self.rows = []
+        self.slides = []
+        self.total = 0
+
+    def add(self, df):
+        self.rows += table_rows(df, self.columns)
+        self.total += len(df)
+        while len(self.rows) >= self.rows_per_slide:
+            self._flush(self.rows[:self.rows_per_slide])
+            del self.rows[:self.rows_per_slide]
+
+    def _flush(self, rows):
+        self.slides.append(self.report._add_table_slide(self.title, self.prototype, rows))
+
+    def finish(self):
+        """Add the last (partial) slide and number the titles; returns the slides"""
+        if self.rows or not self.slides:
+            self._flush(self.rows)
+            self.rows = []
+        for page, slide in enumerate(self.slides):
+            slide.shapes.title.text = page_title(self.title, page, len(self.slides))
+        return self.slides
+
 
 class ReportGenerator:
     """
     Generates PowerPoint summary of RFP automation results.
+    Every report starts from a copy of the cached template deck; match and
+    pricing tables are paginated over as many slides as the data needs.
     """
 
-    def __init__(self, rfp_title: str, pricing_df: pd.DataFrame):
+    def __init__(self, rfp_title: str, pricing_df, template_path=None):
+        from pptx import Presentation
         self.rfp_title = rfp_title
         self.pricing_df = pricing_df
-        self.prs = Presentation()
+        self.prs = Presentation(io.BytesIO(load_template(template_path)))
+        # Match and pricing TableStreams between start_ and finish_table_streams
+        self._streams = None
 
     def add_title_slide(self):
         slide = self.prs.slides.add_slide(self.prs.slide_layouts[0])
@@ -35,42 +146,82 @@ class ReportGenerator:
         slide.placeholders[1].text = content
 
     def add_match_summary(self):
-        slide = self.prs.slides.add_slide(self.prs.slide_layouts[5])
-        slide.shapes.title.text = "RFP Items and Selected SKUs"
+        self.add_table_slides("RFP Items and Selected SKUs", MATCH_COLUMNS)
 
-        rows = min(len(self.pricing_df), 5)
-        table = slide.shapes.add_table(rows + 1, 4, Inches(0.5), Inches(1.8), Inches(9), Inches(1.5)).table
+    def add_pricing_summary(self):
+        self.add_table_slides("Pricing Summary", PRICING_COLUMNS)
 
-        headers = ["Item ID", "Item Description", "Selected SKU", "Match Score (%)"]
-        for i, h in enumerate(headers):
-            table.cell(0, i).text = h
-            table.cell(0, i).text_frame.paragraphs[0].font.bold = True
+    @traced("report.table")
+    def add_table_slides(self, title, columns, rows_per_slide=ROWS_PER_SLIDE):
+        """Add one table slide per rows_per_slide rows of pricing_df, covering every row"""
+        headers = [header for header, _ in columns]
+        prototype = table_prototype(headers)
+        total = len(self.pricing_df)
+        pages = max(1, -(-total // rows_per_slide))
+        current_span().set(rows=total, slides=pages)
 
-        for i in range(rows):
-            row = self.pricing_df.iloc[i]
-            table.cell(i + 1, 0).text = str(row["item_id"])
-            table.cell(i + 1, 1).text = str(row["item_description"])
-            table.cell(i + 1, 2).text = str(row["sku"])
-            table.cell(i + 1, 3).text = str(row["match_score"])
+        for page in range(pages):
+            start = page * rows_per_slide
+            rows = table_rows(self.pricing_df.iloc[start:start + rows_per_slide], columns)
+            self._add_table_slide(page_title(title, page, pages), prototype, rows)
 
-    def add_pricing_summary(self):
+    def _add_table_slide(self, title, prototype, rows):
         slide = self.prs.slides.add_slide(self.prs.slide_layouts[5])
-        slide.shapes.title.text = "Pricing Summary (Sample)"
+        slide.shapes.title.text = title
+        frame = copy.deepcopy(prototype)
+        frame.nvGraphicFramePr.cNvPr.id = slide.shapes._next_shape_id
+        slide.shapes._spTree.append(frame)
+        self._fill_table(slide.shapes[-1], rows)
+        return slide
 
-        rows = min(len(self.pricing_df), 5)
-        table = slide.shapes.add_table(rows + 1, 4, Inches(0.5), Inches(1.8), Inches(9), Inches(1.5)).table
+    def _fill_table(self, shape, rows):
+        """Clone the prototype body row per data row and write the text nodes directly"""
+        from pptx.oxml.ns import qn
+        from pptx.util import Emu
+        tbl = shape.table._tbl
+        body_row = tbl.tr_lst[1]
+        tbl.remove(body_row)
+        slow_cells = []
+        for r, values in enumerate(rows):
+            tr = copy.deepcopy(body_row)
+            for c, (t, text) in enumerate(zip(tr.iter(qn("a:t")), values)):
+                if _SPECIAL_TEXT.search(text):
+                    slow_cells.append((r + 1, c, text))
+                else:
+                    t.text = text
+            tbl.append(tr)
+        for r, c, text in slow_cells:
+            shape.table.cell(r, c).text = text
+        shape.height = Emu(ROW_HEIGHT * (len(rows) + 1))
 
-        headers = ["Item ID", "Quantity", "Unit Price (₹)", "Total Cost (₹)"]
-        for i, h in enumerate(headers):
-            table.cell(0, i).text = h
-            table.cell(0, i).text_frame.paragraphs[0].font.bold = True
+    def start_table_streams(self, rows_per_slide=ROWS_PER_SLIDE):
+        """
+        Begin the match and pricing tables for pricing rows that arrive in
+        chunks (add_table_chunk); pricing_df isn't used
+        """
+        self._streams = [TableStream(self, "RFP Items and Selected SKUs", MATCH_COLUMNS, rows_per_slide),
+                         TableStream(self, "Pricing Summary", PRICING_COLUMNS, rows_per_slide)]
 
-        for i in range(rows):
-            row = self.pricing_df.iloc[i]
-            table.cell(i + 1, 0).text = str(row["item_id"])
-            table.cell(i + 1, 1).text = str(row["quantity"])
-            table.cell(i + 1, 2).text = str(row["unit_price"])
-            table.cell(i + 1, 3).text = str(row["total_cost"])
+    def add_table_chunk(self, df):
+        """Add a chunk of pricing rows to both tables"""
+        for stream in self._streams:
+            stream.add(df)
+
+    @traced("report.table")
+    def finish_table_streams(self):
+        """Close both tables and move the pricing slides after all match slides"""
+        match_stream, pricing_stream = self._streams
+        match_slides = match_stream.finish()
+        pricing_slides = pricing_stream.finish()
+        current_span().set(rows=match_stream.total, slides=len(match_slides) + len(pricing_slides))
+        # Chunks interleave the two tables; the slide order lives in sldIdLst
+        sld_ids = self.prs.slides._sldIdLst
+        by_part = {slide.part: sld_id for slide, sld_id in zip(self.prs.slides, list(sld_ids))}
+        for slide in pricing_slides:
+            sld_id = by_part[slide.part]
+            sld_ids.remove(sld_id)
+            sld_ids.append(sld_id)
+        self._streams = None
 
     def add_conclusion_slide(self):
         slide = self.prs.slides.add_slide(self.prs.slide_layouts[1])
@@ -83,6 +234,43 @@ class ReportGenerator:
             "Next steps: Integrate NLP for spec extraction and deploy with FastAPI UI."
         )
 
+    @traced("report.build")
+    def build(self):
+        """Add the standard slide sequence"""
+        self.add_title_slide()
+        self.add_process_flow()
+        self.add_match_summary()
+        self.add_pricing_summary()
+        self.add_conclusion_slide()
+        current_span().set(slides=len(self.prs.slides))
+        return self
+
+    @traced("report.save")
     def save_ppt(self, filename="AsianPaints_RFP_Report.pptx"):
         self.prs.save(filename)
+        current_span().set(slides=len(self.prs.slides))
         print(f" PPT generated successfully: {filename}")
+
+    @traced("report.save")
+    def to_bytes(self):
+        """Render the deck in memory (e.g. for a download button)"""
+        buffer = io.BytesIO()
+        self.prs.save(buffer)
+        current_span().set(slides=len(self.prs.slides), bytes=buffer.tell())
+        return buffer.getvalue()
+
+
+def render_report(task):
+    """Build and save one standard report; task = (title, pricing_df, filename[, template_path])"""
+    title, pricing_df, filename, *rest = task
+    ReportGenerator(title, pricing_df, *rest).build().save_ppt(filename)
+    return filename
+
+
+def render_reports(tasks, workers=None):
+    """Render a batch of reports (render_report tasks) in parallel worker processes"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        return [render_report(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_report, tasks))
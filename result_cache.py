@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+from tracing import current_span
+
+DEFAULT_CACHE_DIR = "data/.result_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def cache_key(namespace, parts):
+    """Stable digest of a namespace plus JSON-serializable key parts"""
+    payload = json.dumps([namespace, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Local content-addressed cache for pipeline results.
+    Values are pickled into blob files; a SQLite index tracks their size
+    and last access so the total stays under max_bytes (LRU eviction).
+    Hit/miss counters are kept in the index and survive restarts.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), timeout=30)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, namespace TEXT, size INTEGER, "
+                "created REAL, last_access REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def _blob_path(self, key):
+        return os.path.join(self.cache_dir, "blobs", key[:2], key + ".pkl")
+
+    def _count(self, name, n=1):
+        self.db.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, n),
+        )
+
+    def get(self, namespace, parts):
+        """Return the cached value or None"""
+        key = cache_key(namespace, parts)
+        with self.db:
+            row = self.db.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                try:
+                    with open(self._blob_path(key), "rb") as f:
+                        value = pickle.load(f)
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                else:
+                    self.db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+                    self._count(f"{namespace}.hits")
+                    return value
+            self._count(f"{namespace}.misses")
+        return None
+
+    def put(self, namespace, parts, value):
+        """Store a value and evict least-recently-used entries over the size bound"""
+        key = cache_key(namespace, parts)
+        path = self._blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, os.path.getsize(path), now, now),
+            )
+            self._evict()
+
+    def fetch(self, namespace, parts, compute):
+        """Return the cached value, or compute, store and return it"""
+        value = self.get(namespace, parts)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(namespace, parts, value)
+        else:
+            print(f"Cache hit: {namespace}")
+            current_span().add("cache_hits")
+        return value
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            try:
+                os.remove(self._blob_path(key))
+            except OSError:
+                pass
+            total -= size
+            self._count("evictions")
+
+    def stats(self):
+        """Entry count, total bytes and hit/miss/eviction counters"""
+        entries, total = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        counters = dict(self.db.execute("SELECT name, value FROM counters").fetchall())
+        return {"entries": entries, "bytes": total, **counters}
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self.db:
+            for (key,) in self.db.execute("SELECT key FROM entries").fetchall():
+                try:
+                    os.remove(self._blob_path(key))
+                except OSError:
+                    pass
+            self.db.execute("DELETE FROM entries")
+
+    def close(self):
+        self.db.close()
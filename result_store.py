@@ -0,0 +1,305 @@
+import datetime
+import json
+import os
+import re
+import uuid
+import zlib
+import numpy as np
+from matching_engine import SPEC_COLUMNS
+from rfp_items import ABSENT, FLOAT, INTEGER, RfpItems
+
+DEFAULT_STORE_DIR = "data/history"
+MANIFEST_NAME = "manifest.jsonl"
+TABLES = ("matches", "pricing")
+# Item specs stored next to every row, as spec_<name> columns
+STRING_SPECS = ("insulation",)
+# Columns (besides spec_*) whose min/max go into the manifest
+STATS_COLUMNS = ("sku", "match_score", "unit_price", "total_cost")
+# Stored as float64 / int64 whatever dtype a run produced (an all-integer
+# price list reads as int64), so every part of a table shares one schema
+FLOAT_COLUMNS = ("match_score", "unit_price", "material_cost", "tests_cost_per_unit", "total_cost")
+INT_COLUMNS = ("quantity",)
+# Manifest entries list a part's distinct values of a string column up to this many,
+# beyond that a bitmap of their hashes (mod SKETCH_BITS) rules most other values out
+MAX_DISTINCT = 32
+SKETCH_BITS = 1024
+
+
+def partition_name(value):
+    """Directory-safe form of a partition value"""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", str(value)) or "_"
+
+
+def item_specs(items):
+    """spec column -> per-item values (float64 for numbers, object for strings) and item_id -> position"""
+    n = len(items)
+    columns = {}
+    for col in SPEC_COLUMNS:
+        if col in STRING_SPECS:
+            columns[col] = np.full(n, None, dtype=object)
+        else:
+            columns[col] = np.full(n, np.nan)
+    if isinstance(items, RfpItems):
+        item_ids = items.item_ids
+        for col, values in columns.items():
+            spec = items.specs.get(col)
+            if spec is None:
+                continue
+            if col in STRING_SPECS:
+                for i in np.flatnonzero(spec.kinds != ABSENT).tolist():
+                    values[i] = str(spec.value(i))
+            else:
+                numbers = (spec.kinds == INTEGER) | (spec.kinds == FLOAT)
+                values[numbers] = spec.numbers[numbers]
+    else:
+        item_ids = [item.get("item_id") for item in items]
+        for i, item in enumerate(items):
+            specs = item.get("specs") or {}
+            for col, values in columns.items():
+                v = specs.get(col)
+                if v is None:
+                    continue
+                if col in STRING_SPECS:
+                    values[i] = str(v)
+                elif isinstance(v, (int, float)) and not isinstance(v, bool):
+                    values[i] = v
+    positions = {}
+    for i, item_id in enumerate(item_ids):
+        positions.setdefault(item_id, i)
+    return columns, positions
+
+
+def sketch_bit(value):
+    return zlib.crc32(str(value).encode("utf-8")) % SKETCH_BITS
+
+
+def column_stats(table):
+    """Manifest statistics of the filterable columns: min/max, and the distinct values of small string columns"""
+    import pyarrow.compute as pc
+    import pyarrow.types as pat
+    stats = {}
+    for name in table.column_names:
+        if name not in STATS_COLUMNS and not name.startswith("spec_"):
+            continue
+        column = table.column(name)
+        numeric = pat.is_integer(column.type) or pat.is_floating(column.type)
+        text = pat.is_string(column.type) or pat.is_large_string(column.type)
+        if column.null_count == len(column) or not (numeric or text):
+            continue
+        bounds = pc.min_max(column)
+        entry = {"min": bounds["min"].as_py(), "max": bounds["max"].as_py()}
+        if text:
+            distinct = pc.unique(column.drop_null())
+            if len(distinct) <= MAX_DISTINCT:
+                entry["values"] = sorted(distinct.to_pylist())
+            else:
+                sketch = 0
+                for value in distinct.to_pylist():
+                    sketch |= 1 << sketch_bit(value)
+                entry["sketch"] = f"{sketch:x}"
+        stats[name] = entry
+    return stats
+
+
+class ResultStore:
+    """
+    Append-only Parquet history of match and pricing results.
+    Each append writes one file under <table>/rfp_id=<id>/date=<YYYY-MM-DD>/
+    and one line to manifest.jsonl (rows, min/max of the SKU, price and
+    spec columns),
+    so nothing is ever rewritten and concurrent batch workers can append.
+    query() picks parts from the manifest (RFP, date, SKU and spec
+    ranges) and reads only those files and the requested columns, with
+    the remaining filter pushed into the Parquet reader.
+    Needs pyarrow (imported on first use).
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+
+    def append(self, table, df, rfp_id, items=None, catalog_version=None, recorded_at=None):
+        """
+        Store one run's rows. items (the RFP items) adds the requested specs
+        as spec_<name> columns, looked up by item_id. Returns the manifest entry.
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if table not in TABLES:
+            raise ValueError(f"Unknown result table: {table}")
+        if df is None or len(df) == 0:
+            return None
+        recorded_at = recorded_at or datetime.datetime.now(datetime.timezone.utc)
+        date = recorded_at.date().isoformat()
+        run_id = uuid.uuid4().hex[:16]
+
+        data = {"rfp_id": np.full(len(df), str(rfp_id), dtype=object),
+                "date": np.full(len(df), date, dtype=object),
+                "recorded_at": np.full(len(df), recorded_at.isoformat(), dtype=object),
+                "run_id": np.full(len(df), run_id, dtype=object)}
+        for col in df.columns:
+            values = df[col].to_numpy()
+            if np.issubdtype(values.dtype, np.number):
+                if col in FLOAT_COLUMNS:
+                    values = values.astype(np.float64)
+                elif col in INT_COLUMNS:
+                    values = values.astype(np.int64)
+            data[col] = values
+        if items is not None:
+            specs, positions = item_specs(items)
+            rows = np.array([positions.get(i, -1) for i in df["item_id"].tolist()], dtype=np.int64)
+            for col, values in specs.items():
+                picked = values[np.maximum(rows, 0)]
+                picked[rows < 0] = None if picked.dtype == object else np.nan
+                data["spec_" + col] = picked
+        arrow_table = pa.Table.from_pandas(pd.DataFrame(data), preserve_index=False)
+
+        relative = os.path.join(table, f"rfp_id={partition_name(rfp_id)}", f"date={date}", f"part-{run_id}.parquet")
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        pq.write_table(arrow_table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+
+        entry = {"table": table, "path": relative, "rfp_id": str(rfp_id), "date": date, "run_id": run_id,
+                 "recorded_at": recorded_at.isoformat(), "catalog_version": catalog_version,
+                 "rows": len(df), "stats": column_stats(arrow_table)}
+        # One short line per part; O_APPEND writes from several processes don't interleave
+        line = (json.dumps(entry, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        fd = os.open(self.manifest_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        return entry
+
+    def manifest(self):
+        """Every manifest entry, oldest first"""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+    def parts(self, table, rfp_id=None, since=None, until=None, sku=None, specs=None):
+        """Manifest entries of `table` that can hold rows matching the query"""
+        rfp_ids = None if rfp_id is None else {str(r) for r in _as_list(rfp_id)}
+        skus = None if sku is None else _as_list(sku)
+        selected = []
+        for entry in self.manifest():
+            if entry["table"] != table:
+                continue
+            if rfp_ids is not None and entry["rfp_id"] not in rfp_ids:
+                continue
+            if (since and entry["date"] < str(since)) or (until and entry["date"] > str(until)):
+                continue
+            stats = entry.get("stats", {})
+            if skus is not None and not any(_may_contain(stats.get("sku"), s) for s in skus):
+                continue
+            if specs and not all(_spec_may_match(stats.get("spec_" + col), value) for col, value in specs.items()):
+                continue
+            selected.append(entry)
+        return selected
+
+    def query(self, table, columns=None, rfp_id=None, since=None, until=None, sku=None, specs=None):
+        """
+        Rows of `table` as a DataFrame, reading only the parts and columns needed.
+        rfp_id / sku: one value or a list; since / until: inclusive "YYYY-MM-DD";
+        specs: {"conductor_mm2": 16, "voltage_kv": (0.6, 1.1), "insulation": "XLPE"}
+        (numbers or inclusive (lo, hi) ranges; strings compare case-insensitively)
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+        entries = self.parts(table, rfp_id, since, until, sku, specs)
+        if not entries:
+            return pd.DataFrame(columns=columns) if columns else pd.DataFrame([])
+
+        conditions = []
+        if rfp_id is not None:
+            conditions.append(ds.field("rfp_id").isin([str(r) for r in _as_list(rfp_id)]))
+        if since:
+            conditions.append(ds.field("date") >= str(since))
+        if until:
+            conditions.append(ds.field("date") <= str(until))
+        if sku is not None:
+            conditions.append(ds.field("sku").isin(_as_list(sku)))
+        for col, value in (specs or {}).items():
+            field = ds.field("spec_" + col)
+            if isinstance(value, str):
+                conditions.append(pc.utf8_lower(field) == value.lower())
+            elif isinstance(value, tuple):
+                conditions.append((field >= value[0]) & (field <= value[1]))
+            else:
+                conditions.append(field == value)
+        condition = None
+        for c in conditions:
+            condition = c if condition is None else condition & c
+
+        # Footers only: parts missing a column (e.g. no spec_*) read it as nulls;
+        # parts written before FLOAT_COLUMNS existed may hold int64 prices
+        paths = [os.path.join(self.root, e["path"]) for e in entries]
+        schema = pa.unify_schemas([pq.read_schema(path) for path in paths], promote_options="permissive")
+        result = ds.dataset(paths, format="parquet", schema=schema).to_table(columns=columns, filter=condition)
+        return result.to_pandas()
+
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _may_contain(stats, value):
+    """False only if the part's statistics rule the value out"""
+    if stats is None:
+        return True
+    if "values" in stats:
+        return value in stats["values"]
+    if "sketch" in stats and not int(stats["sketch"], 16) >> sketch_bit(value) & 1:
+        return False
+    try:
+        return stats["min"] <= value <= stats["max"]
+    except TypeError:
+        return True
+
+
+def _spec_may_match(stats, value):
+    if stats is None:
+        return False
+    if isinstance(value, str):
+        if "values" in stats:
+            return value.lower() in {str(v).lower() for v in stats["values"]}
+        return True
+    lo, hi = value if isinstance(value, tuple) else (value, value)
+    try:
+        return hi >= stats["min"] and lo <= stats["max"]
+    except TypeError:
+        return True
+
+
+
+# ---- Run for testing ----
+if __name__ == "__main__":
+    import tempfile
+    import pandas as pd
+
+    # Parts with int64 and float64 prices (different catalogs) query together
+    with tempfile.TemporaryDirectory() as root:
+        store = ResultStore(root)
+        rows = {"item_id": ["I1"], "item_description": ["Cable"], "sku": ["SKU-1"], "product_name": ["Cable"],
+                "match_score": [100]}
+        store.append("matches", pd.DataFrame({**rows, "unit_price": [250]}), "RFP-1")
+        store.append("matches", pd.DataFrame({**rows, "unit_price": [99.5]}), "RFP-2")
+        result = store.query("matches", columns=["rfp_id", "unit_price", "match_score"])
+        print(result.sort_values("rfp_id").to_string(index=False))
+        assert sorted(result["unit_price"].tolist()) == [99.5, 250.0]
+        print("Mixed-dtype parts queried together.")
@@ -0,0 +1,214 @@
+import sys
+from array import array
+from itertools import islice
+import numpy as np
+
+# Kind of a spec value, per item
+ABSENT, INTEGER, FLOAT, TEXT, OTHER = range(5)
+# Integers above this don't survive a float64 round trip
+MAX_EXACT_INT = 2 ** 53
+ITEM_KEYS = ("item_id", "description", "specs")
+
+
+class _Missing:
+    """Placeholder for an item key the input didn't have (pickles as the singleton)"""
+
+    def __reduce__(self):
+        return "_MISSING"
+
+    def __repr__(self):
+        return "<missing>"
+
+
+_MISSING = _Missing()
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class SpecColumn:
+    """
+    One spec across all items: an int8 kind per item, float64 values for
+    numbers, int32 codes into an interned vocabulary for strings, and a
+    row -> value dict for anything else (bools, None, lists).
+    """
+
+    __slots__ = ("kinds", "numbers", "codes", "vocab", "other")
+
+    def __init__(self, kinds, numbers, codes, vocab, other):
+        self.kinds = kinds
+        self.numbers = numbers
+        self.codes = codes
+        self.vocab = vocab
+        self.other = other
+
+    def value(self, i):
+        """The original value for item i (ABSENT items return _MISSING)"""
+        kind = self.kinds[i]
+        if kind == INTEGER:
+            return int(self.numbers[i])
+        if kind == FLOAT:
+            return float(self.numbers[i])
+        if kind == TEXT:
+            return self.vocab[self.codes[i]]
+        if kind == OTHER:
+            return self.other[i]
+        return _MISSING
+
+
+class _SpecBuilder:
+    """Accumulates one SpecColumn in typed buffers while items stream in"""
+
+    def __init__(self, rows_before):
+        self.kinds = array("b", bytes(rows_before))
+        self.numbers = array("d", bytes(8 * rows_before))
+        self.codes = array("i", bytes(4 * rows_before))
+        self.vocab = {}
+        self.other = {}
+
+    def append(self, row, value):
+        kind, number, code = OTHER, 0.0, 0
+        t = type(value)
+        if t is float:
+            kind, number = FLOAT, value
+        elif t is int and abs(value) <= MAX_EXACT_INT:
+            kind, number = INTEGER, value
+        elif t is str:
+            kind, code = TEXT, self.vocab.setdefault(value, len(self.vocab))
+        else:
+            self.other[row] = value
+        self.kinds.append(kind)
+        self.numbers.append(number)
+        self.codes.append(code)
+
+    def pad(self, rows):
+        missing = rows - len(self.kinds)
+        if missing:
+            self.kinds.frombytes(bytes(missing))
+            self.numbers.frombytes(bytes(8 * missing))
+            self.codes.frombytes(bytes(4 * missing))
+
+    def build(self):
+        vocab = [sys.intern(v) for v in self.vocab]
+        codes = np.array(self.codes, dtype=np.int32) if vocab else None
+        return SpecColumn(np.array(self.kinds, dtype=np.int8), np.array(self.numbers, dtype=np.float64),
+                          codes, vocab, self.other)
+
+
+class RfpItems:
+    """
+    Compact, column-wise store of RFP items (what SalesAgent.get_rfp_items
+    returns). Item ids and descriptions are interned strings and every spec
+    is a SpecColumn, so a tender costs a few bytes per spec instead of a
+    dict per item. Indexing or iterating yields the usual item dicts
+    {"item_id", "description", "specs"}, rebuilt on demand.
+    """
+
+    def __init__(self, item_ids, descriptions, specs, extras=None):
+        self.item_ids = item_ids
+        self.descriptions = descriptions
+        # spec name -> SpecColumn, in first-seen order
+        self.specs = specs
+        # row -> item keys besides item_id/description/specs (rare)
+        self.extras = extras or {}
+
+    @classmethod
+    def from_dicts(cls, items):
+        """Build from any iterable of item dicts (consumed one item at a time)"""
+        item_ids, descriptions, builders, extras = [], [], {}, {}
+        for row, item in enumerate(items):
+            item_ids.append(_intern(item.get("item_id", _MISSING)))
+            descriptions.append(_intern(item.get("description", _MISSING)))
+            specs = item.get("specs", _MISSING)
+            other = {k: v for k, v in item.items() if k not in ITEM_KEYS}
+            if not isinstance(specs, dict):
+                other["specs"] = specs
+                specs = {}
+            if other:
+                extras[row] = other
+            for key, value in specs.items():
+                builder = builders.get(key)
+                if builder is None:
+                    builder = builders[key] = _SpecBuilder(row)
+                builder.pad(row)
+                builder.append(row, value)
+        rows = len(item_ids)
+        for builder in builders.values():
+            builder.pad(rows)
+        return cls(item_ids, descriptions, {key: b.build() for key, b in builders.items()}, extras)
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def item(self, i):
+        """Item i as a plain dict"""
+        item = {}
+        for key, value in (("item_id", self.item_ids[i]), ("description", self.descriptions[i])):
+            if value is not _MISSING:
+                item[key] = value
+        item["specs"] = {}
+        for key, column in self.specs.items():
+            value = column.value(i)
+            if value is not _MISSING:
+                item["specs"][key] = value
+        for key, value in self.extras.get(i, {}).items():
+            if value is _MISSING:
+                del item[key]
+            else:
+                item[key] = value
+        return item
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.item(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("item index out of range")
+        return self.item(i)
+
+    def __iter__(self):
+        return (self.item(i) for i in range(len(self)))
+
+    def __repr__(self):
+        return f"RfpItems({len(self)} items, specs={list(self.specs)})"
+
+    def take(self, rows):
+        """The items at the given positions, as a new RfpItems"""
+        rows = np.asarray(rows, dtype=np.int64)
+        listed = rows.tolist()
+        specs = {}
+        for key, column in self.specs.items():
+            other = {j: column.other[i] for j, i in enumerate(listed) if i in column.other}
+            codes = None if column.codes is None else column.codes[rows]
+            specs[key] = SpecColumn(column.kinds[rows], column.numbers[rows], codes, column.vocab, other)
+        extras = {j: self.extras[i] for j, i in enumerate(listed) if i in self.extras}
+        return RfpItems([self.item_ids[i] for i in listed], [self.descriptions[i] for i in listed], specs, extras)
+
+    def spec_counts(self):
+        """Number of specs given per item"""
+        counts = np.zeros(len(self), dtype=np.int64)
+        for column in self.specs.values():
+            counts += column.kinds != ABSENT
+        return counts
+
+    def to_list(self):
+        return list(self)
+
+
+def iter_chunks(items, size):
+    """RfpItems of up to `size` items at a time, consuming any iterable of item dicts lazily"""
+    items = iter(items)
+    while True:
+        chunk = RfpItems.from_dicts(islice(items, size))
+        if not len(chunk):
+            return
+        yield chunk
+
+
+def json_default(value):
+    """json.dump default= hook: RfpItems as a list of item dicts, anything else as str"""
+    if isinstance(value, RfpItems):
+        return value.to_list()
+    return str(value)
@@ -1,73 +1,398 @@
+import io
 import json
-import pdfplumber
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from pdf_ocr import DEFAULT_OCR_CACHE_DIR, PageOcr, needs_ocr, ocr_unavailable
+from rfp_items import RfpItems
+from tracing import current_span, traced
+
+# Metadata labels in the PDF and the rfp_data keys they fill
+METADATA_FIELDS = {
+    "Project": "title",
+    "Client": "buyer",
+    "RFP ID": "id",
+    "Due Date": "due_date",
+}
+METADATA_DEFAULTS = {
+    "id": "RFP-UNKNOWN",
+    "title": "Untitled RFP",
+    "buyer": "Unknown Client",
+    "due_date": "Unknown",
+}
+# Page ranges handed to each worker in parallel mode (more ranges than
+# workers keeps the pool busy when some pages are table-heavy)
+RANGES_PER_WORKER = 4
+# Bump when a PDF parsing change makes cached rfp_data stale
+PDF_PARSER_VERSION = 2
+# Characters read at a time when streaming a JSON RFP
+JSON_CHUNK = 1 << 16
+METADATA_PATTERN = re.compile(
+    r"(?P<label>" + "|".join(re.escape(label) for label in METADATA_FIELDS) + r"):\s*(?P<value>.*)"
+)
+
+
+class MetadataScanner:
+    """
+    Finds the first "Label: value" occurrence of every metadata field
+    with a single precompiled pattern, page by page.
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    @property
+    def complete(self):
+        return len(self.values) == len(METADATA_FIELDS)
+
+    def scan(self, text):
+        pos = 0
+        while not self.complete:
+            match = METADATA_PATTERN.search(text, pos)
+            if match is None:
+                break
+            key = METADATA_FIELDS[match.group("label")]
+            self.values.setdefault(key, match.group("value"))
+            # Step one character so overlapping labels are still seen
+            pos = match.start() + 1
+
+    def merge(self, values):
+        """Add fields found further on in the document (earlier ones win)"""
+        for key, value in values.items():
+            self.values.setdefault(key, value)
+
+    def to_rfp(self, items):
+        rfp = {key: self.values.get(key, default) for key, default in METADATA_DEFAULTS.items()}
+        rfp["items"] = items
+        return rfp
+
+
+class JsonReader:
+    """
+    Decodes a JSON document one value at a time from a text file read in
+    JSON_CHUNK pieces, so only the value being decoded is held in memory.
+    """
+
+    _whitespace = re.compile(r"\s*")
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(JSON_CHUNK)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ("" at the end of the input)"""
+        while True:
+            self.pos = self._whitespace.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        """Consume the next character, which must be one of chars; returns it"""
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError(f"Invalid JSON RFP: expected one of {chars!r}, found {c or 'end of file'!r}")
+        self.pos += 1
+        return c
+
+    def value(self):
+        """Decode the next complete value (reading more until it ends before the buffer does)"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+                # A number cut off by the end of the buffer ("1" of "12", "1" of "1.5")
+                # decodes too: only accept a value followed by something else
+                if self.eof or (end < len(self.buf) and self.buf[end] not in "0123456789.eE+-"):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_json_items(f, metadata):
+    """
+    Stream the "items" of a JSON RFP object one item dict at a time; the
+    other top-level keys go into the metadata dict as they are read.
+    """
+    reader = JsonReader(f)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == "items" and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.expect(",]") == "]":
+                        break
+        else:
+            metadata[key] = reader.value()
+        if reader.expect(",}") == "}":
+            return
+
+
+def parse_item_row(row):
+    """Turn one table row into an RFP item dict, or None if it isn't one"""
+    try:
+        item_id, desc, conductor, insulation, voltage, temp = row
+        return {
+            "item_id": item_id.strip(),
+            "description": desc.strip(),
+            "specs": {
+                "conductor_mm2": float(conductor),
+                "insulation": insulation.strip(),
+                "voltage_kv": float(voltage),
+                "temperature_rating_C": float(temp)
+            }
+        }
+    except Exception:
+        return None
+
+
+def iter_pdf_pages(pdf_path, pages=None, metadata=None, items=True, ocr=None):
+    """
+    Stream item rows out of a PDF one page at a time.
+    Each page is visited once: its text feeds the metadata scanner
+    (until every field is found) and its tables are parsed into items,
+    then the page's layout objects are released.
+    pdf_path: a path or binary file object.
+    pages: optional 1-based page numbers to restrict the pass to.
+    ocr: optional PageOcr; pages without a text layer are handed to it and
+    their rows come back in document order once recognised (falling back
+    to whatever text layer the page has if OCR returns nothing).
+    """
+    # (OCR future or None, page text, page items) per page, in page order
+    pending = deque()
+    import pdfplumber
+    with pdfplumber.open(pdf_path, pages=pages) as pdf:
+        for page in pdf.pages:
+            if not items and (metadata is None or metadata.complete):
+                break
+            scanned = ocr is not None and needs_ocr(page)
+            text, page_items = None, []
+            # A scanned page's own text layer, if any, stands in when OCR can't read it
+            if not scanned or page.chars:
+                text = page.extract_text() if metadata is not None and not metadata.complete else None
+                if items:
+                    for table in page.extract_tables():
+                        page_items += parse_table(table[1:])  # Skip header row
+            if scanned:
+                pending.append((ocr.submit(page), text, page_items))
+                current_span().add("ocr_pages")
+            else:
+                pending.append((None, text, page_items))
+            page.close()
+            current_span().add("pages")
+            while pending and (pending[0][0] is None or pending[0][0].done()):
+                yield from resolve_page(pending.popleft(), metadata, items)
+        while pending:
+            yield from resolve_page(pending.popleft(), metadata, items)
+
+
+def parse_table(rows):
+    """Item dicts of the rows that parse as items"""
+    return [item for item in map(parse_item_row, rows) if item is not None]
+
+
+def resolve_page(entry, metadata, items):
+    """Scan a page's text for metadata and return its items (waiting for OCR if needed)"""
+    future, text, page_items = entry
+    if future is not None:
+        try:
+            ocr_text, rows = future.result()
+        except Exception as e:
+            print(f"⚠️ OCR failed for a scanned page: {e}")
+            ocr_text, rows = None, []
+        # OCR unavailable or nothing recognised: keep the page's text layer
+        if ocr_text or rows:
+            text = ocr_text
+            page_items = parse_table(rows) if items else []
+    if text and metadata is not None and not metadata.complete:
+        metadata.scan(text)
+    return page_items
+
+
+def parse_page_range(task):
+    """Process-pool worker: parse pages [start, stop) of a PDF it opens itself"""
+    pdf_path, start, stop, scan_metadata, scan_items, ocr_cache_dir = task
+    metadata = MetadataScanner() if scan_metadata else None
+    pages = list(range(start + 1, stop + 1))
+    if ocr_cache_dir is None:
+        items = RfpItems.from_dicts(iter_pdf_pages(pdf_path, pages, metadata, scan_items))
+    else:
+        # Already one of several range workers: OCR this range's pages inline
+        with PageOcr(pdf_path, workers=1, cache_dir=ocr_cache_dir) as ocr:
+            items = RfpItems.from_dicts(iter_pdf_pages(pdf_path, pages, metadata, scan_items, ocr))
+    return items, (metadata.values if metadata else {})
+
+
+def page_ranges(page_count, parts):
+    """Split page indices 0..page_count into at most `parts` contiguous ranges"""
+    parts = max(1, min(parts, page_count))
+    step, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        stop = start + step + (1 if i < extra else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
 
 class SalesAgent:
     """
     Sales Agent reads RFPs (JSON or PDF) and extracts product requirements.
     """
 
-    def __init__(self, rfp_path: str):
+    def __init__(self, rfp_path: str, workers=1, rfp_bytes=None, ocr=True, ocr_workers=None,
+                 ocr_cache_dir=DEFAULT_OCR_CACHE_DIR):
         self.rfp_path = rfp_path
+        # Optional in-memory file content (e.g. an upload); rfp_path then
+        # only tells the format apart
+        self.rfp_bytes = rfp_bytes
         self.rfp_data = None
+        # PDF pages are parsed in this many processes (1 = serial)
+        self.workers = workers
+        # Scanned PDF pages are OCRed in ocr_workers processes (default: CPU count)
+        self.ocr = ocr
+        self.ocr_workers = ocr_workers
+        self.ocr_cache_dir = ocr_cache_dir
+
+    def parser_tag(self):
+        """What decides load_rfp's output besides the file itself (a cache key part)"""
+        if not self.rfp_path.endswith(".pdf"):
+            return "json"
+        mode = "ocr" if self.ocr and ocr_unavailable() is None else "text"
+        return f"pdf-v{PDF_PARSER_VERSION}-{mode}"
 
-    def load_rfp(self):
-        """Load RFP JSON or parse PDF"""
+    @traced("sales.load_rfp")
+    def load_rfp(self, workers=None):
+        """Load RFP JSON or parse PDF (in parallel when workers > 1)"""
+        workers = workers or self.workers
         try:
             if self.rfp_path.endswith(".json"):
-                with open(self.rfp_path, "r") as f:
-                    self.rfp_data = json.load(f)
+                if self.rfp_bytes is not None:
+                    self.rfp_data = json.loads(self.rfp_bytes)
+                else:
+                    with open(self.rfp_path, "r") as f:
+                        self.rfp_data = json.load(f)
+                if "items" in self.rfp_data:
+                    self.rfp_data["items"] = RfpItems.from_dicts(self.rfp_data["items"])
                 print(f"✅ Loaded RFP (JSON): {self.rfp_data['title']}")
             elif self.rfp_path.endswith(".pdf"):
-                self.rfp_data = self._parse_pdf_rfp()
+                if workers > 1 and self.rfp_bytes is None:
+                    self.rfp_data = self._parse_pdf_rfp_parallel(workers)
+                else:
+                    self.rfp_data = self._parse_pdf_rfp()
                 print(f"✅ Parsed RFP (PDF): {self.rfp_data['title']}")
             else:
                 raise ValueError("Unsupported file format. Please upload JSON or PDF.")
+            current_span().set(items=len(self.rfp_data.get("items", [])))
         except Exception as e:
             print(f"❌ Error loading RFP file: {e}")
 
     def _parse_pdf_rfp(self):
         """Parse RFP details from PDF into structured format"""
+        metadata = MetadataScanner()
+        return metadata.to_rfp(RfpItems.from_dicts(self.iter_pdf_items(metadata)))
+
+    def _parse_pdf_rfp_parallel(self, workers):
+        """
+        Parse page ranges in a process pool and merge them in document order.
+        Only the first range scans for metadata; the rest are scanned in a
+        second pass only if some field wasn't found there.
+        """
+        import pdfplumber
         with pdfplumber.open(self.rfp_path) as pdf:
-            text = "\n".join([page.extract_text() for page in pdf.pages if page.extract_text()])
-            tables = []
-            for page in pdf.pages:
-                page_tables = page.extract_tables()
-                if page_tables:
-                    tables.extend(page_tables)
-
-        # Extract metadata
-        title = re.search(r"Project:\s*(.*)", text)
-        client = re.search(r"Client:\s*(.*)", text)
-        rfp_id = re.search(r"RFP ID:\s*(.*)", text)
-        due_date = re.search(r"Due Date:\s*(.*)", text)
-
-        # Extract items from tables
-        items = []
-        for table in tables:
-            for row in table[1:]:  # Skip header row
-                try:
-                    item_id, desc, conductor, insulation, voltage, temp = row
-                    items.append({
-                        "item_id": item_id.strip(),
-                        "description": desc.strip(),
-                        "specs": {
-                            "conductor_mm2": float(conductor),
-                            "insulation": insulation.strip(),
-                            "voltage_kv": float(voltage),
-                            "temperature_rating_C": float(temp)
-                        }
-                    })
-                except Exception:
-                    continue
+            page_count = len(pdf.pages)
+        ranges = page_ranges(page_count, workers * RANGES_PER_WORKER)
 
-        return {
-            "id": rfp_id.group(1) if rfp_id else "RFP-UNKNOWN",
-            "title": title.group(1) if title else "Untitled RFP",
-            "buyer": client.group(1) if client else "Unknown Client",
-            "due_date": due_date.group(1) if due_date else "Unknown",
-            "items": items
-        }
+        metadata = MetadataScanner()
+        parts = []
+        ocr_cache_dir = self.ocr_cache_dir if self.ocr else None
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tasks = [(self.rfp_path, start, stop, i == 0, True, ocr_cache_dir)
+                     for i, (start, stop) in enumerate(ranges)]
+            for range_items, values in pool.map(parse_page_range, tasks):
+                parts.append(range_items)
+                metadata.merge(values)
+            if not metadata.complete and len(ranges) > 1:
+                tasks = [(self.rfp_path, start, stop, True, False, ocr_cache_dir) for start, stop in ranges[1:]]
+                for _, values in pool.map(parse_page_range, tasks):
+                    metadata.merge(values)
+        print(f"Parsed {page_count} pages with {workers} workers.")
+        current_span().set(pages=page_count, workers=workers)
+        return metadata.to_rfp(RfpItems.from_dicts(chain.from_iterable(parts)))
+
+    def iter_items(self):
+        """
+        Stream the RFP's item dicts while the document is being read
+        (JSON or PDF, without parallel page parsing). rfp_data holds the
+        metadata found so far and is complete, without "items", once the
+        generator is exhausted. Unlike load_rfp, a read or parse error is
+        re-raised after it is printed: items already yielded are only part
+        of the tender.
+        """
+        self.rfp_data = {}
+        count = 0
+        try:
+            if self.rfp_path.endswith(".json"):
+                if self.rfp_bytes is not None:
+                    text = self.rfp_bytes.decode("utf-8") if isinstance(self.rfp_bytes, bytes) else self.rfp_bytes
+                    f = io.StringIO(text)
+                else:
+                    f = open(self.rfp_path, "r", encoding="utf-8")
+                with f:
+                    for item in iter_json_items(f, self.rfp_data):
+                        count += 1
+                        yield item
+                print(f"✅ Streamed RFP (JSON): {self.rfp_data.get('title')}")
+            elif self.rfp_path.endswith(".pdf"):
+                metadata = MetadataScanner()
+                for item in self.iter_pdf_items(metadata):
+                    self.rfp_data.update(metadata.values)
+                    count += 1
+                    yield item
+                self.rfp_data.update(metadata.to_rfp(None))
+                del self.rfp_data["items"]
+                print(f"✅ Streamed RFP (PDF): {self.rfp_data['title']}")
+            else:
+                raise ValueError("Unsupported file format. Please upload JSON or PDF.")
+        except Exception as e:
+            print(f"❌ Error reading RFP file after {count} items: {e}")
+            raise
+        finally:
+            current_span().set(items=count)
+
+    def iter_pdf_items(self, metadata=None):
+        """Stream item rows out of the PDF one page at a time (OCRing scanned pages)"""
+        source = io.BytesIO(self.rfp_bytes) if self.rfp_bytes is not None else self.rfp_path
+        if not self.ocr:
+            yield from iter_pdf_pages(source, metadata=metadata)
+            return
+        pdf = self.rfp_bytes if self.rfp_bytes is not None else self.rfp_path
+        with PageOcr(pdf, self.ocr_workers, self.ocr_cache_dir) as ocr:
+            yield from iter_pdf_pages(source, metadata=metadata, ocr=ocr)
 
     def display_rfp_summary(self):
         """Print RFP details (for human readability)"""
@@ -89,7 +414,7 @@ class SalesAgent:
         print("-" * 50)
 
     def get_rfp_items(self):
-        """Return list of items"""
+        """Return the items (an RfpItems; indexing or iterating gives item dicts)"""
         if not self.rfp_data:
             return []
         return self.rfp_data["items"]
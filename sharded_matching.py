@@ -0,0 +1,176 @@
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from matching_engine import (SPEC_COLUMNS, ItemBatch, MatchResult, SkuMatrix, count_matches,
+                             score_tables, select_top_k)
+
+# Item x SKU cells per task: small enough to stay cache-friendly and to
+# give every worker several tiles, large enough to amortize the IPC
+TILE_CELLS = 1 << 20
+
+# Catalog columns attached by init_worker in each pool process
+_worker_matrix = None
+
+
+def share_columns(matrix: SkuMatrix):
+    """
+    Copy the SkuMatrix arrays count_matches reads (numeric specs, string
+    codes, price_rank) into new shared memory blocks. Returns (layout,
+    blocks): layout maps each array to its (block name, dtype, shape) and
+    is all a worker needs to map it; the caller unlinks the blocks.
+    String codes cover numeric spec columns too: an item spec given as a
+    string (e.g. "16") is compared as a string.
+    """
+    arrays = {"price_rank": matrix.price_rank}
+    for col, values in matrix.numeric.items():
+        arrays["numeric:" + col] = values
+    for col in SPEC_COLUMNS:
+        arrays["codes:" + col] = matrix.string_codes(col)[0]
+    layout, blocks = {}, {}
+    try:
+        for key, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            block = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+            blocks[key] = block
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+            layout[key] = (block.name, values.dtype.str, values.shape)
+    except Exception:
+        release(blocks)
+        raise
+    return layout, blocks
+
+
+def release(blocks):
+    """Close and unlink shared memory blocks"""
+    for block in blocks.values():
+        block.close()
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedColumns:
+    """Catalog columns of share_columns, mapped in a worker process (count_matches input)"""
+
+    def __init__(self, layout):
+        self.blocks = {}
+        arrays = {}
+        for key, (name, dtype, shape) in layout.items():
+            # Pool processes share the parent's resource tracker, so attaching
+            # doesn't hand the block to a tracker that unlinks it on exit
+            block = shared_memory.SharedMemory(name=name)
+            self.blocks[key] = block
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        self.price_rank = arrays.pop("price_rank")
+        self.size = len(self.price_rank)
+        self.numeric = {key[len("numeric:"):]: a for key, a in arrays.items() if key.startswith("numeric:")}
+        self.codes = {key[len("codes:"):]: a for key, a in arrays.items() if key.startswith("codes:")}
+
+    def string_codes(self, col):
+        return self.codes[col], None
+
+
+class ItemBlock:
+    """Rows of an ItemBatch sent to a worker (count_matches input)"""
+
+    def __init__(self, numeric, strings, rows):
+        self.numeric = numeric
+        self.strings = strings
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+
+def init_worker(layout):
+    global _worker_matrix
+    _worker_matrix = SharedColumns(layout)
+
+
+def score_tile(task):
+    """
+    Top-k of an item block within one SKU shard: (rank keys, catalog
+    positions, scores), each items x min(top_k, shard size)
+    """
+    block, total_idx, rank_table, score_table, start, stop, top_k = task
+    matrix = _worker_matrix
+    skus = slice(start, stop)
+    matched = count_matches(block, matrix, slice(None), skus)
+    t = total_idx[:, None]
+    keys = rank_table[t, matched] * matrix.size + matrix.price_rank[None, skus]
+    top = select_top_k(keys, top_k)
+    scores = score_table[t, np.take_along_axis(matched, top, axis=1)]
+    return np.take_along_axis(keys, top, axis=1), top + start, scores
+
+
+class ShardedMatcher:
+    """
+    Multi-core tolerance matching. The catalog columns are copied into
+    shared memory once and every pool process maps them at start-up, so a
+    task carries only a block of encoded items and a SKU range. Each
+    (item block x SKU shard) tile yields its own top-k; the shard lists of
+    an item are merged on the same (score desc, unit_price asc, catalog
+    order) key as match_items, so results are identical to it.
+    Use as a context manager or call close() to stop the pool and free
+    the shared memory.
+    """
+
+    def __init__(self, matrix: SkuMatrix, workers=None, shards=None, tile_cells=TILE_CELLS):
+        self.matrix = matrix
+        self.workers = workers or os.cpu_count() or 1
+        self.shards = max(1, min(shards or self.workers, matrix.size))
+        self.tile_cells = tile_cells
+        self.bounds = np.linspace(0, matrix.size, self.shards + 1).astype(np.int64)
+        self.layout, blocks = share_columns(matrix)
+        self._finalizer = weakref.finalize(self, release, blocks)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                        initargs=(self.layout,))
+
+    def match_items(self, items, top_k=3, as_frame=True):
+        """Top-k SKUs per item, ranked like matching_engine.match_items"""
+        if not len(items) or self.matrix.size == 0 or top_k <= 0:
+            return MatchResult.empty(items, self.matrix).finish(as_frame)
+
+        batch = ItemBatch(items, self.matrix)
+        unique_totals, score_table, rank_table = score_tables(batch.totals)
+        total_idx = np.searchsorted(unique_totals, batch.totals)
+        shard_size = int(np.max(np.diff(self.bounds)))
+        block_rows = max(1, self.tile_cells // shard_size)
+
+        blocks, futures = [], []
+        for start in range(0, len(batch), block_rows):
+            rows = slice(start, min(start + block_rows, len(batch)))
+            block = ItemBlock({col: v[rows] for col, v in batch.numeric.items()},
+                              {col: c[rows] for col, c in batch.strings.items()}, rows.stop - rows.start)
+            blocks.append(rows)
+            futures.append([self.pool.submit(score_tile, (block, total_idx[rows], rank_table, score_table,
+                                                          int(lo), int(hi), top_k))
+                            for lo, hi in zip(self.bounds[:-1], self.bounds[1:]) if hi > lo])
+
+        item_pos, sku_pos, scores = [], [], []
+        for rows, tiles in zip(blocks, futures):
+            parts = [f.result() for f in tiles]
+            # Every key is unique (it ends in the global price rank), so
+            # the k smallest over the shards' top-k lists are the global top-k
+            keys = np.concatenate([p[0] for p in parts], axis=1)
+            top = select_top_k(keys, top_k)
+            item_pos.append(np.repeat(np.arange(rows.start, rows.stop, dtype=np.int32), top.shape[1]))
+            sku_pos.append(np.take_along_axis(np.concatenate([p[1] for p in parts], axis=1), top, axis=1)
+                           .ravel().astype(self.matrix.price_rank.dtype))
+            scores.append(np.take_along_axis(np.concatenate([p[2] for p in parts], axis=1), top, axis=1).ravel())
+
+        return MatchResult(items, self.matrix, np.concatenate(item_pos),
+                           np.concatenate(sku_pos), np.concatenate(scores)).finish(as_frame)
+
+    def close(self):
+        self.pool.shutdown()
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
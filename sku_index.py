@@ -0,0 +1,186 @@
+import numpy as np
+from matching_engine import ItemBatch, MatchResult, SkuMatrix, position_dtype, score_tables
+from tracing import current_span
+
+# Relative slack added around tolerance windows before the exact re-check,
+# so float rounding at the window edges never drops a real match.
+EDGE_SLACK = 1e-9
+
+
+class SkuIndex:
+    """
+    Tolerance-range index over the SKU catalog.
+    Numeric specs are kept as SKU positions grouped by distinct value in
+    ascending order (a ±10% window becomes two binary searches over the
+    distinct values), string specs as buckets per value code.
+    """
+
+    def __init__(self, matrix: SkuMatrix):
+        self.matrix = matrix
+        positions = position_dtype(matrix.size)
+        self.sorted = {}
+        for col, values in matrix.numeric.items():
+            valid = np.flatnonzero(~np.isnan(values))
+            uniques, inverse = np.unique(values[valid], return_inverse=True)
+            order = valid[np.argsort(inverse, kind="stable")].astype(positions)
+            starts = np.zeros(len(uniques) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(inverse, minlength=len(uniques)), out=starts[1:])
+            self.sorted[col] = (order, starts, uniques.astype(np.float64))
+        self._buckets = {}
+
+        # Catalog order by (unit_price, position), used for zero-score fill
+        self.price_order = np.argsort(matrix.price_rank).astype(positions)
+
+    def buckets(self, col):
+        """Return (order, starts) grouping SKU positions by string code"""
+        if col not in self._buckets:
+            codes, vocab = self.matrix.string_codes(col)
+            order = np.argsort(codes, kind="stable").astype(position_dtype(self.matrix.size))
+            starts = np.searchsorted(codes[order], np.arange(len(vocab) + 1))
+            self._buckets[col] = (order, starts)
+        return self._buckets[col]
+
+    def postings(self, batch: ItemBatch, i):
+        """
+        Return one (size, col, kind, value, bounds, sku positions) entry per
+        spec of item i. Numeric windows are a superset of the true matches;
+        the exact predicate is re-applied when counting.
+        """
+        lists = []
+        for col, values in batch.numeric.items():
+            v = values[i]
+            if np.isnan(v):
+                continue
+            tolerance = max(0.1, 0.1 * abs(v))
+            slack = EDGE_SLACK * (abs(v) + tolerance)
+            bounds = (v - tolerance - slack, v + tolerance + slack)
+            order, starts, uniques = self.sorted[col]
+            lo = starts[np.searchsorted(uniques, bounds[0], side="left")]
+            hi = starts[np.searchsorted(uniques, bounds[1], side="right")]
+            lists.append((hi - lo, col, "numeric", v, bounds, order[lo:hi]))
+        for col, codes in batch.strings.items():
+            code = codes[i]
+            if code == -1:
+                continue
+            if code == -2:
+                lists.append((0, col, "string", code, None, np.empty(0, dtype=np.int64)))
+                continue
+            order, starts = self.buckets(col)
+            lists.append((starts[code + 1] - starts[code], col, "string", code, None,
+                          order[starts[code]:starts[code + 1]]))
+        lists.sort(key=lambda entry: entry[0])
+        return lists
+
+    def in_posting(self, entry, positions):
+        """Mask of the SKU positions that appear in a posting list"""
+        _, col, kind, value, bounds, _ = entry
+        if kind == "numeric":
+            values = self.matrix.numeric[col][positions]
+            return (values >= bounds[0]) & (values <= bounds[1])
+        codes, _ = self.matrix.string_codes(col)
+        return codes[positions] == value
+
+    def union(self, lists):
+        """Union of posting lists without hashing: later lists drop SKUs already in earlier ones"""
+        parts = [lists[0][5]]
+        for r in range(1, len(lists)):
+            positions = lists[r][5]
+            for entry in lists[:r]:
+                positions = positions[~self.in_posting(entry, positions)]
+            parts.append(positions)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def count_matches(self, lists, candidates):
+        """Exact number of matched specs for a subset of SKU positions"""
+        matched = np.zeros(len(candidates), dtype=np.int8)
+        for _, col, kind, value, _, _ in lists:
+            if kind == "numeric":
+                tolerance = max(0.1, 0.1 * abs(value))
+                matched += np.abs(value - self.matrix.numeric[col][candidates]) <= tolerance
+            else:
+                codes, _ = self.matrix.string_codes(col)
+                matched += codes[candidates] == value
+        return matched
+
+    def top_k(self, lists, ranks, top_k):
+        """
+        Return (SKU positions, matched counts) of the top_k SKUs for one item.
+
+        A SKU matching at least j of the s non-empty specs must appear in
+        at least one of any s - j + 1 posting lists, so the union of the
+        s - j + 1 shortest lists holds every such SKU. Once k SKUs there
+        reach j matches, nothing outside the union can enter the top-k.
+        SKUs in no list match nothing and can only fill remaining slots
+        in price order.
+        """
+        n = self.matrix.size
+        s = len(lists)
+        candidates = np.empty(0, dtype=self.price_order.dtype)
+        matched = np.empty(0, dtype=np.int8)
+        for j in range(s, 0, -1):
+            candidates = self.union(lists[:s - j + 1])
+            matched = self.count_matches(lists, candidates)
+            current_span().add("skus_scored", len(candidates))
+            if np.count_nonzero(matched >= j) >= top_k:
+                keep = matched >= j
+                candidates, matched = candidates[keep], matched[keep]
+                break
+        else:
+            # Fewer than k SKUs match anything: drop window false positives
+            # so zero-score SKUs are only added by the price-ordered fill.
+            keep = matched > 0
+            candidates, matched = candidates[keep], matched[keep]
+
+        keys = ranks[matched] * n + self.matrix.price_rank[candidates]
+        if len(keys) > top_k:
+            part = np.argpartition(keys, top_k - 1)[:top_k]
+        else:
+            part = np.arange(len(keys))
+        part = part[np.argsort(keys[part])]
+        chosen, chosen_matched = candidates[part], matched[part]
+
+        missing = top_k - len(chosen)
+        if missing > 0:
+            head = self.price_order[:top_k]
+            fill = head[~np.isin(head, candidates)][:missing]
+            chosen = np.concatenate([chosen, fill])
+            chosen_matched = np.concatenate([chosen_matched, np.zeros(len(fill), dtype=np.int8)])
+        return chosen, chosen_matched
+
+    def prune_report(self, item: dict, top_k=3):
+        """Show how many SKUs one item had to score and why the rest were skipped"""
+        batch = ItemBatch([item], self.matrix)
+        lists = self.postings(batch, 0)
+        unique_totals, score_table, rank_table = score_tables(batch.totals)
+        chosen, chosen_matched = self.top_k(lists, rank_table[0], top_k)
+        relevant = self.union(lists) if lists else np.empty(0, dtype=np.int64)
+        relevant = relevant[self.count_matches(lists, relevant) > 0]
+        return {
+            "item_id": item["item_id"],
+            "catalog_size": self.matrix.size,
+            "relevant_skus": len(relevant),
+            "kth_score": float(score_table[0, chosen_matched[-1]]) if len(chosen) else None,
+            "rest_upper_bound": float(score_table[0, 0]),
+            "pruned_skus": self.matrix.size - len(relevant),
+        }
+
+    def match_items(self, items, top_k=3, as_frame=True):
+        """Top-k matches per item using the index, same layout as match_items"""
+        if not len(items) or self.matrix.size == 0 or top_k <= 0:
+            return MatchResult.empty(items, self.matrix).finish(as_frame)
+
+        batch = ItemBatch(items, self.matrix)
+        unique_totals, score_table, rank_table = score_tables(batch.totals)
+        total_idx = np.searchsorted(unique_totals, batch.totals)
+        top_k = min(top_k, self.matrix.size)
+
+        item_pos, sku_pos, scores = [], [], []
+        for i in range(len(items)):
+            ranks = rank_table[total_idx[i]]
+            chosen, chosen_matched = self.top_k(self.postings(batch, i), ranks, top_k)
+            item_pos.append(np.full(len(chosen), i, dtype=np.int32))
+            sku_pos.append(chosen)
+            scores.append(score_table[total_idx[i], chosen_matched])
+
+        return MatchResult(items, self.matrix, np.concatenate(item_pos),
+                           np.concatenate(sku_pos), np.concatenate(scores)).finish(as_frame)
@@ -1,4 +1,12 @@
-import pandas as pd
+import numpy as np
+from catalog_cache import CatalogCache, file_digest
+from distance_index import DistanceIndex
+from match_memo import MATCH_MEMO
+from matching_engine import (ItemBatch, MatchResult, SkuMatrix, expand_matches, match_items, take_items,
+                             unique_signatures)
+from sharded_matching import ShardedMatcher
+from sku_index import SkuIndex
+from tracing import current_span, traced
 
 class TechnicalAgent:
     """
@@ -7,18 +15,108 @@ class TechnicalAgent:
     match score for each SKU.
     """
 
-    def __init__(self, sku_data_path: str):
+    def __init__(self, sku_data_path: str, cache_dir=None):
         self.sku_data_path = sku_data_path
-        self.sku_df = None
+        self.cache_dir = cache_dir
+        self.catalog = None
+        self._sku_df = None
+        self.sku_matrix = None
+        self.sku_index = None
+        self.distance_index = None
+        self.sharded_matcher = None
+        self._catalog_version = None
 
-    def load_sku_data(self):
-        """Load SKU data from CSV"""
+    @property
+    def sku_df(self):
+        """Catalog as a DataFrame; materialized from the compiled cache on first access"""
+        if self._sku_df is None and self.catalog is not None:
+            self._sku_df = self.catalog.to_frame()
+        return self._sku_df
+
+    @sku_df.setter
+    def sku_df(self, df):
+        self._sku_df = df
+        self.catalog = None
+        self.sku_matrix = None
+        self.sku_index = None
+        self.distance_index = None
+        self.close_sharded()
+        self._catalog_version = None
+
+    @property
+    def catalog_version(self):
+        """Content hash of the loaded catalog file (None if the catalog was set in memory)"""
+        if self.catalog is not None:
+            return self.catalog.manifest["sha256"]
+        if self._catalog_version == "file":
+            self._catalog_version = file_digest(self.sku_data_path)
+        return self._catalog_version
+
+    @traced("technical.load_catalog")
+    def load_sku_data(self, build_index=False, use_cache=True):
+        """
+        Load SKU data, optionally prebuilding the tolerance index.
+        With use_cache the CSV is compiled once into a memory-mapped
+        columnar cache and reopened from there while it is unchanged.
+        """
         try:
-            self.sku_df = pd.read_csv(self.sku_data_path)
-            print(f"Loaded {len(self.sku_df)} SKUs successfully.")
+            if use_cache:
+                catalog = CatalogCache(self.sku_data_path, self.cache_dir).open()
+                self.sku_df = None
+                self.catalog = catalog
+                print(f"Loaded {len(catalog)} SKUs successfully (compiled cache).")
+                current_span().set(skus=len(catalog))
+            else:
+                import pandas as pd
+                self.sku_df = pd.read_csv(self.sku_data_path)
+                self._catalog_version = "file"
+                print(f"Loaded {len(self.sku_df)} SKUs successfully.")
+                current_span().set(skus=len(self.sku_df))
+            if build_index:
+                self.build_index()
         except Exception as e:
             print(f" Error loading SKU data: {e}")
 
+    def get_sku_matrix(self):
+        """Column arrays of the loaded catalog, built once"""
+        if self.sku_matrix is None:
+            source = self.catalog if self.catalog is not None else self.sku_df
+            self.sku_matrix = SkuMatrix(source)
+        return self.sku_matrix
+
+    @traced("technical.build_index")
+    def build_index(self):
+        """Build column arrays and the tolerance-range index for the loaded catalog"""
+        if self.sku_index is None:
+            self.sku_index = SkuIndex(self.get_sku_matrix())
+        return self.sku_index
+
+    @traced("technical.build_distance_index")
+    def build_distance_index(self):
+        """Build the per-insulation KD-trees used by distance scoring"""
+        if self.distance_index is None:
+            self.distance_index = DistanceIndex(self.get_sku_matrix())
+        return self.distance_index
+
+    @traced("technical.build_sharded")
+    def build_sharded(self, workers=None):
+        """
+        Start the process pool used by engine="sharded" (catalog columns in
+        shared memory); a different worker count restarts it
+        """
+        if self.sharded_matcher is not None and workers and workers != self.sharded_matcher.workers:
+            self.close_sharded()
+        if self.sharded_matcher is None:
+            self.sharded_matcher = ShardedMatcher(self.get_sku_matrix(), workers=workers)
+            current_span().set(workers=self.sharded_matcher.workers)
+        return self.sharded_matcher
+
+    def close_sharded(self):
+        """Stop the engine="sharded" pool and free its shared memory"""
+        if self.sharded_matcher is not None:
+            self.sharded_matcher.close()
+            self.sharded_matcher = None
+
     def spec_match_score(self, rfp_specs: dict, sku_specs: dict):
         """
         Calculate match score between RFP specs and SKU specs.
@@ -43,12 +141,104 @@ class TechnicalAgent:
                     matched += 1
         return round((matched / total) * 100, 2)
 
-    def match_rfp_items(self, rfp_items: list, top_k=3):
+    @traced("technical.match")
+    def match_rfp_items(self, rfp_items, top_k=3, engine=None, verify=False, as_frame=True,
+                        scoring="tolerance", insulation_weight=None, dedupe=True):
         """
         For each RFP item, calculate match scores and return top-k matches.
+        scoring="tolerance" (default) counts specs within ±10% / equal:
+        engine="vectorized" (default) scores the item x SKU matrix in NumPy batches,
+        engine="index" scores only SKUs the tolerance index can't rule out,
+        engine="sharded" splits the vectorized scoring over a process pool
+        (see build_sharded),
+        engine="rowwise" runs spec_match_score SKU by SKU.
+        scoring="distance" ranks the closest SKUs by log-scale distance over
+        the numeric specs (Match Score 100 = identical, 50 = one tolerance
+        away): engine="index" (default) queries per-insulation KD-trees,
+        engine="vectorized" scans every SKU. insulation_weight=None only
+        returns SKUs with the item's insulation, a number instead adds that
+        many tolerances of distance to SKUs with another insulation.
+        dedupe=True matches each distinct spec signature once (see
+        match_unique_specs) and gives every item sharing it the same rows.
+        verify=True also runs the brute-force vectorized path item by item
+        and raises AssertionError if the results differ.
+        as_frame=False returns a MatchResult (index/score arrays) instead
+        of the DataFrame.
+        """
+        if scoring not in ("tolerance", "distance"):
+            raise ValueError(f"Unknown scoring: {scoring}")
+        engine = engine or ("index" if scoring == "distance" else "vectorized")
+        current_span().set(items=len(rfp_items), engine=engine, scoring=scoring)
+        if dedupe and engine != "rowwise" and len(rfp_items):
+            result = self.match_unique_specs(rfp_items, top_k, engine, scoring, insulation_weight)
+        else:
+            result = self.match_each_item(rfp_items, top_k, engine, scoring, insulation_weight)
+        if verify:
+            import pandas as pd
+            frame = result.to_frame()
+            expected = self.match_each_item(rfp_items, top_k, "vectorized", scoring, insulation_weight).to_frame()
+            pd.testing.assert_frame_equal(frame, expected)
+            print(f"Matches verified against brute force ({len(frame)} rows).")
+        return result.finish(as_frame)
+
+    def match_unique_specs(self, rfp_items, top_k, engine, scoring, insulation_weight):
         """
-        results = []
-        for item in rfp_items:
+        Match every distinct spec signature once and fan its top-k out to
+        all items sharing it. Signatures matched before against the same
+        catalog version (in this process) are answered from MATCH_MEMO.
+        """
+        matrix = self.get_sku_matrix()
+        signatures, first, inverse = unique_signatures(ItemBatch(rfp_items, matrix))
+        version = self.catalog_version
+        params = (scoring, top_k, insulation_weight if scoring == "distance" else None)
+        keys = [(version, params, row.tobytes()) for row in signatures]
+        found = [MATCH_MEMO.get(key) if version else None for key in keys]
+        missing = [s for s, value in enumerate(found) if value is None]
+        if missing:
+            result = self.match_each_item(take_items(rfp_items, first[missing]), top_k, engine, scoring,
+                                          insulation_weight)
+            bounds = np.searchsorted(result.item_pos, np.arange(len(missing) + 1))
+            for j, s in enumerate(missing):
+                rows = slice(bounds[j], bounds[j + 1])
+                found[s] = (result.sku_pos[rows].copy(), result.scores[rows].copy())
+                if version:
+                    MATCH_MEMO.put(keys[s], found[s])
+        current_span().set(unique_specs=len(signatures), memo_hits=len(signatures) - len(missing))
+
+        starts = np.zeros(len(found) + 1, dtype=np.int64)
+        np.cumsum([len(sku_pos) for sku_pos, _ in found], out=starts[1:])
+        sku_pos = np.concatenate([sku_pos for sku_pos, _ in found])
+        scores = np.concatenate([scores for _, scores in found])
+        return expand_matches(rfp_items, matrix, sku_pos, scores, starts, inverse)
+
+    def match_each_item(self, items, top_k, engine, scoring, insulation_weight):
+        """Run one matching engine over all items; returns a MatchResult"""
+        if scoring == "distance":
+            index = self.build_distance_index()
+            if engine == "vectorized":
+                current_span().set(skus_scored=len(items) * index.matrix.size)
+                return index.match_items_brute_force(items, top_k, insulation_weight, as_frame=False)
+            if engine != "index":
+                raise ValueError(f"Unknown distance engine: {engine}")
+            return index.match_items(items, top_k, insulation_weight, as_frame=False)
+        if engine == "index":
+            return self.build_index().match_items(items, top_k=top_k, as_frame=False)
+        if engine == "vectorized":
+            matrix = self.get_sku_matrix()
+            current_span().set(skus_scored=len(items) * matrix.size)
+            return match_items(items, matrix, top_k=top_k, as_frame=False)
+        if engine == "sharded":
+            matcher = self.build_sharded()
+            current_span().set(skus_scored=len(items) * matcher.matrix.size, workers=matcher.workers)
+            return matcher.match_items(items, top_k=top_k, as_frame=False)
+        if engine != "rowwise":
+            raise ValueError(f"Unknown matching engine: {engine}")
+        current_span().set(skus_scored=len(items) * len(self.sku_df))
+
+        matrix = self.get_sku_matrix()
+        prices = self.sku_df["unit_price"].tolist()
+        item_pos, sku_pos, top_scores = [], [], []
+        for i, item in enumerate(items):
             scores = []
             for _, sku in self.sku_df.iterrows():
                 sku_specs = {
@@ -57,20 +247,16 @@ class TechnicalAgent:
                     "voltage_kv": sku["voltage_kv"],
                     "temperature_rating_C": sku["temperature_rating_C"]
                 }
-                score = self.spec_match_score(item["specs"], sku_specs)
-                scores.append({
-                    "item_id": item["item_id"],
-                    "item_description": item["description"],
-                    "sku": sku["sku"],
-                    "product_name": sku["product_name"],
-                    "match_score": score,
-                    "unit_price": sku["unit_price"]
-                })
+                scores.append(self.spec_match_score(item["specs"], sku_specs))
             # Sort by score (desc), price (asc)
-            top_matches = sorted(scores, key=lambda x: (-x["match_score"], x["unit_price"]))[:top_k]
-            results.extend(top_matches)
+            top = sorted(range(len(scores)), key=lambda j: (-scores[j], prices[j]))[:top_k]
+            item_pos += [i] * len(top)
+            sku_pos += top
+            top_scores += [scores[j] for j in top]
+
+        return MatchResult(items, matrix, np.array(item_pos, dtype=np.int32),
+                           np.array(sku_pos, dtype=matrix.price_rank.dtype), np.array(top_scores))
 
-        return pd.DataFrame(results)
 
 # ---- Run for testing ----
 if __name__ == "__main__":
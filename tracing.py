@@ -0,0 +1,252 @@
+import functools
+import json
+import threading
+import time
+import tracemalloc
+import uuid
+
+# The running Tracer of each thread (Streamlit sessions and the artifact
+# writer run on their own threads and never share spans)
+_local = threading.local()
+# tracemalloc is process-wide: started by the first memory-tracking Tracer,
+# stopped when the last one exits (unless something else started it)
+_memory_lock = threading.Lock()
+_memory_users = 0
+_memory_owned = False
+
+
+class _NoopSpan:
+    """Returned by span() while tracing is off; every method does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **counts):
+        pass
+
+    def add(self, key, n=1):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **counts):
+    """
+    Context manager timing one step of the pipeline:
+        with span("technical.match", items=len(items)) as s:
+            ...
+            s.set(skus_scored=n)
+    A shared no-op when no Tracer is active.
+    """
+    tracer = getattr(_local, "tracer", None)
+    if tracer is None:
+        return NOOP_SPAN
+    return Span(tracer, name, counts)
+
+
+def current_span():
+    """Innermost open span of the active Tracer (a no-op span when tracing is off)"""
+    tracer = getattr(_local, "tracer", None)
+    if tracer is None or not tracer.stack:
+        return NOOP_SPAN
+    return tracer.stack[-1]
+
+
+def traced(name):
+    """Decorator running a function inside span(name)"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "tracer", None) is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Span:
+    """One timed step: wall time, CPU time, peak traced memory above its start, row counts"""
+
+    __slots__ = ("tracer", "name", "counts", "children", "parent", "wall_s", "cpu_s", "peak_mb",
+                 "error", "_start", "_cpu_start", "_mem_start", "_peak")
+
+    def __init__(self, tracer, name, counts):
+        self.tracer = tracer
+        self.name = name
+        self.counts = dict(counts)
+        self.children = []
+        self.parent = None
+        self.wall_s = self.cpu_s = self.peak_mb = None
+        self.error = None
+
+    def set(self, **counts):
+        self.counts.update(counts)
+
+    def add(self, key, n=1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def __enter__(self):
+        tracer = self.tracer
+        self.parent = tracer.stack[-1] if tracer.stack else None
+        (self.parent.children if self.parent else tracer.roots).append(self)
+        tracer.stack.append(self)
+        if tracer.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # Keep the parent's peak so far before the counter is reset for this span
+            if self.parent is not None:
+                self.parent._peak = max(self.parent._peak, peak)
+            tracemalloc.reset_peak()
+            self._mem_start = self._peak = current
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_s = time.perf_counter() - self._start
+        self.cpu_s = time.process_time() - self._cpu_start
+        tracer = self.tracer
+        if tracer.memory:
+            peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self.peak_mb = (peak - self._mem_start) / 1e6
+            if self.parent is not None:
+                self.parent._peak = max(self.parent._peak, peak)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        tracer.stack.pop()
+        return False
+
+    def to_dict(self):
+        data = {
+            "name": self.name,
+            "wall_s": round(self.wall_s, 6) if self.wall_s is not None else None,
+            "cpu_s": round(self.cpu_s, 6) if self.cpu_s is not None else None,
+            "peak_mb": round(self.peak_mb, 3) if self.peak_mb is not None else None,
+            "counts": self.counts,
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict() for child in self.children]
+        return data
+
+
+def _start_memory():
+    global _memory_users, _memory_owned
+    with _memory_lock:
+        if _memory_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memory_owned = True
+        _memory_users += 1
+
+
+def _stop_memory():
+    global _memory_users, _memory_owned
+    with _memory_lock:
+        _memory_users -= 1
+        if _memory_users == 0 and _memory_owned:
+            tracemalloc.stop()
+            _memory_owned = False
+
+
+class Tracer:
+    """
+    Collects the spans recorded while it is active:
+        with Tracer(memory=True) as tracer:
+            MasterAgent().run()
+        tracer.save_json("trace.json")
+    memory=True also tracks peak memory with tracemalloc: opt in for
+    one-off traces only, it slows the traced code down by about half and
+    concurrent traced runs in one process see each other's allocations.
+    Wall and CPU time are always recorded.
+    """
+
+    def __init__(self, name="rfp", memory=False):
+        self.name = name
+        self.memory = memory
+        self.trace_id = uuid.uuid4().hex
+        self.roots = []
+        self.stack = []
+        self.started = None
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = getattr(_local, "tracer", None)
+        self.started = time.time()
+        if self.memory:
+            _start_memory()
+        _local.tracer = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.tracer = self._previous
+        if self.memory:
+            _stop_memory()
+        return False
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started": self.started,
+            "spans": [root.to_dict() for root in self.roots],
+        }
+
+    def save_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        print(f"Trace saved to {path}")
+
+    def breakdown(self):
+        """Flat list of spans in call order with their depth (for tables and charts)"""
+        rows = []
+
+        def walk(spans, depth):
+            for s in spans:
+                rows.append({"span": s.name, "depth": depth, "wall_s": s.wall_s, "cpu_s": s.cpu_s,
+                             "peak_mb": s.peak_mb, **s.counts})
+                walk(s.children, depth + 1)
+
+        walk(self.roots, 0)
+        return rows
+
+    def prometheus(self, prefix="rfp"):
+        """Prometheus text-format snapshot, aggregated by span name"""
+        totals = {}
+        for row in self.breakdown():
+            agg = totals.setdefault(row["span"], {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak": 0.0, "counts": {}})
+            agg["calls"] += 1
+            agg["wall"] += row["wall_s"] or 0.0
+            agg["cpu"] += row["cpu_s"] or 0.0
+            agg["peak"] = max(agg["peak"], row["peak_mb"] or 0.0)
+            for key, value in row.items():
+                if key not in ("span", "depth", "wall_s", "cpu_s", "peak_mb") and isinstance(value, (int, float)):
+                    agg["counts"][key] = agg["counts"].get(key, 0) + value
+
+        metrics = [
+            ("span_calls_total", "counter", "Times the span ran.", lambda a: a["calls"]),
+            ("span_wall_seconds", "gauge", "Wall-clock time spent in the span.", lambda a: a["wall"]),
+            ("span_cpu_seconds", "gauge", "CPU time spent in the span.", lambda a: a["cpu"]),
+        ]
+        if self.memory:
+            metrics.append(("span_peak_bytes", "gauge", "Peak traced memory above the span's start.",
+                            lambda a: int(a["peak"] * 1e6)))
+        lines = []
+        for metric, kind, help_text, value in metrics:
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} {kind}"]
+            lines += [f'{prefix}_{metric}{{span="{name}"}} {value(agg):g}' for name, agg in totals.items()]
+        lines += [f"# HELP {prefix}_span_rows Rows handled by the span (items, SKUs scored, rows priced, slides).",
+                  f"# TYPE {prefix}_span_rows gauge"]
+        for name, agg in totals.items():
+            lines += [f'{prefix}_span_rows{{span="{name}",count="{key}"}} {value:g}'
+                      for key, value in agg["counts"].items()]
+        return "\n".join(lines) + "\n"
+
+    def save_prometheus(self, path, prefix="rfp"):
+        with open(path, "w") as f:
+            f.write(self.prometheus(prefix))
+        print(f"Metrics snapshot saved to {path}")